@@ -4,6 +4,7 @@ from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import func
 from typing import List, Optional, Tuple
 import asyncio
+import functools
 import json
 from app.database import get_db
 from app.schemas import (
@@ -32,6 +33,7 @@ from app.models import (
     TestCaseStatus,
     InteractionType,
     Project,
+    UserInput,
 )
 from app.services.task_executor import TaskExecutor
 from app.services.git_worktree import GitWorktreeManager
@@ -237,7 +239,7 @@ async def create_task(
 
     # Build end criteria configuration JSON
     end_criteria_config = None
-    if end_criteria_text or task_data.max_iterations or task_data.max_tokens:
+    if end_criteria_text or task_data.max_iterations or task_data.max_tokens or task_data.max_wall_seconds:
         end_criteria_config = {}
         if end_criteria_text:
             end_criteria_config["criteria"] = end_criteria_text
@@ -248,6 +250,8 @@ async def create_task(
             end_criteria_config["max_iterations"] = 20
         if task_data.max_tokens is not None:
             end_criteria_config["max_tokens"] = task_data.max_tokens
+        if task_data.max_wall_seconds is not None:
+            end_criteria_config["max_wall_seconds"] = task_data.max_wall_seconds
         if criteria_warning:
             end_criteria_config["warning"] = criteria_warning
 
@@ -816,7 +820,6 @@ Please continue from where we left off. If you were in the middle of a task, ple
     task.claude_session_id = None  # Force new session
     task.error_message = None
     task.status = TaskStatus.RUNNING
-    task.user_input_pending = False
     db.commit()
 
     # Start task execution in background
@@ -1011,8 +1014,9 @@ async def clear_and_restart_task(
     ).delete()
 
     # Clear user input queue to ensure fresh start
-    task.user_input_queue = None
-    task.user_input_pending = False
+    from app.services.user_input_manager import UserInputManager
+    db.query(UserInput).filter(UserInput.task_id == task.id).delete(synchronize_session=False)
+    UserInputManager.forget_recent_inputs(task.id)
     task.custom_human_input = None  # Clear legacy user input field
 
     # Clear Claude session ID to force a new conversation session
@@ -1277,7 +1281,7 @@ async def stream_task_conversation(task_name: str, db: Session = Depends(get_db)
 
             # Send interactions: all existing on first connection, then only new ones
             if current_count > last_interaction_count or is_initial_connection:
-                from app.utils.conversation_formatter import collapse_consecutive_tool_results
+                from app.utils.conversation_formatter import iter_collapsed_tool_results
 
                 if is_initial_connection and current_count > 0:
                     # Send ALL existing interactions on first connection with tool grouping
@@ -1286,7 +1290,7 @@ async def stream_task_conversation(task_name: str, db: Session = Depends(get_db)
                     ).order_by(ClaudeInteraction.created_at).all()
 
                     # Apply the same tool grouping logic as conversation API
-                    formatted_interactions = collapse_consecutive_tool_results(all_interactions, collapse_tools=True)
+                    formatted_interactions = iter_collapsed_tool_results(all_interactions, collapse_tools=True)
 
                     for data in formatted_interactions:
                         yield f"data: {json.dumps(data)}\n\n"
@@ -1301,7 +1305,7 @@ async def stream_task_conversation(task_name: str, db: Session = Depends(get_db)
                     ).order_by(ClaudeInteraction.created_at).all()
 
                     # Apply the same tool grouping logic as conversation API
-                    formatted_interactions = collapse_consecutive_tool_results(all_interactions, collapse_tools=True)
+                    formatted_interactions = iter_collapsed_tool_results(all_interactions, collapse_tools=True)
 
                     # For real-time streaming, we need to send ALL formatted messages
                     # Frontend will handle deduplication by ID
@@ -1361,31 +1365,28 @@ async def set_custom_human_input(
     images = request.get("images", [])
 
     # Check for recent duplicate messages to prevent spam/repeated submissions
-    import time
-    from datetime import datetime, timedelta
-
-    # Get current queue to check for recent duplicates
-    current_queue = task.user_input_queue or []
-    recent_cutoff = datetime.utcnow() - timedelta(seconds=30)  # 30 second window
-
-    for entry in current_queue:
-        entry_time = datetime.fromisoformat(entry.get("timestamp", "1970-01-01T00:00:00"))
-        entry_input = entry.get("input", "")
-        if entry_time > recent_cutoff and entry_input == user_input:
-            print(f"🚫 DUPLICATE MESSAGE BLOCKED: '{user_input[:50]}...' was already sent within 30 seconds")
-            return {
-                "message": "Duplicate message blocked - same message was recently sent",
-                "task_name": task_name,
-                "input_preview": user_input[:100] + "..." if len(user_input) > 100 else user_input,
-                "blocked_reason": "DUPLICATE_MESSAGE_WITHIN_30_SECONDS"
-            }
+    if UserInputManager.is_recent_duplicate(db, task.id, user_input):
+        print(f"🚫 DUPLICATE MESSAGE BLOCKED: '{user_input[:50]}...' was already sent within 30 seconds")
+        return {
+            "message": "Duplicate message blocked - same message was recently sent",
+            "task_name": task_name,
+            "input_preview": user_input[:100] + "..." if len(user_input) > 100 else user_input,
+            "blocked_reason": "DUPLICATE_MESSAGE_WITHIN_30_SECONDS"
+        }
 
     # Use new high-priority user input queue system
     # Use separate session to avoid transaction conflicts with endpoint session
     print(f"🔍 DEBUG: Adding user input to queue for task {task.id} ({task_name}): '{user_input[:50]}...'")
     if images:
         print(f"🖼️ DEBUG: Including {len(images)} images with user input")
-    success = UserInputManager.add_user_input(db, task.id, user_input, auto_commit=True, use_separate_session=True, images=images if images else None)
+    # Run the insert in a worker thread so the event loop isn't blocked on the DB
+    success = await asyncio.get_running_loop().run_in_executor(
+        None,
+        functools.partial(
+            UserInputManager.add_user_input, db, task.id, user_input,
+            auto_commit=True, use_separate_session=True, images=images if images else None
+        )
+    )
     print(f"🔍 DEBUG: UserInputManager.add_user_input() returned: {success}")
 
     if not success:
@@ -1437,14 +1438,12 @@ async def set_custom_human_input(
         else:
             # No active process - restart executor as before
             print(f"🔄 Task {task_name} is RUNNING but no active process - restarting task executor to process user input")
-            print(f"🔍 DEBUG: Before task executor restart - task.user_input_queue = {task.user_input_queue}")
             from app.services.task_executor import TaskExecutor
             executor = TaskExecutor()
             background_tasks.add_task(executor.execute_task, task.id)
             task_executor_restarted = True
             immediate_success = False
             print(f"✅ Task executor restarted for {task_name} - user input will be processed by task executor")
-            print(f"🔍 DEBUG: After task executor restart - task.user_input_queue = {task.user_input_queue}")
 
             # Mark the message as processed since it's being sent to Claude
             # This implements the rule: "as long as it is sent to Claude, it is processed"
@@ -1474,19 +1473,6 @@ async def set_custom_human_input(
         task_executor_restarted = False
         print(f"⚠️ Task {task_name} status is {task.status.value} - input queued but task not running")
 
-    # CRITICAL FIX: Use fresh session to see UserInputManager's committed changes
-    from app.database import SessionLocal
-    fresh_db = SessionLocal()
-    try:
-        fresh_task = fresh_db.query(Task).filter(Task.id == task.id).first()
-        print(f"🔍 DEBUG: After UserInputManager commit - fresh query shows task.user_input_queue = {fresh_task.user_input_queue if fresh_task else 'Task not found'}")
-        # Update our task object with the fresh data
-        if fresh_task:
-            task.user_input_queue = fresh_task.user_input_queue
-            task.user_input_pending = fresh_task.user_input_pending
-    finally:
-        fresh_db.close()
-
     # Set legacy field for backward compatibility
     task.custom_human_input = user_input
     print(f"🔍 DEBUG: About to commit legacy field for task {task.id}")
@@ -1,7 +1,9 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, JSON
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import QueuePool
+from sqlalchemy.types import TypeDecorator
+import orjson
 import os
 from dotenv import load_dotenv
 
@@ -9,6 +11,30 @@ load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./tasks.db")
 
+
+class OrjsonJSON(TypeDecorator):
+    """
+    JSON column encoded/decoded with orjson instead of the stdlib.
+
+    Used for the base64 image lists on user inputs and interactions, which are
+    the large JSON payloads and only hold strings. Other JSON columns keep the
+    stdlib encoder, which accepts values orjson rejects (e.g. non-str keys).
+    """
+
+    impl = JSON
+    cache_ok = True
+
+    def bind_processor(self, dialect):
+        def process(value):
+            return None if value is None else orjson.dumps(value).decode()
+        return process
+
+    def result_processor(self, dialect, coltype):
+        def process(value):
+            return None if value is None else orjson.loads(value)
+        return process
+
+
 # Configure engine based on database type
 if "sqlite" in DATABASE_URL:
     engine = create_engine(
@@ -20,13 +46,22 @@ elif "mysql" in DATABASE_URL:
         DATABASE_URL,
         poolclass=QueuePool,
         pool_size=10,
-        pool_recycle=3600,
+        max_overflow=20,  # Absorb bursts of concurrent task executions
+        pool_timeout=30,
+        pool_recycle=1800,
         pool_pre_ping=True,  # Verify connections before using
         echo=False,  # Set to True for SQL debugging
     )
 else:
     # Generic configuration for other databases
-    engine = create_engine(DATABASE_URL)
+    engine = create_engine(
+        DATABASE_URL,
+        pool_size=10,
+        max_overflow=20,
+        pool_timeout=30,
+        pool_recycle=1800,
+        pool_pre_ping=True,
+    )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
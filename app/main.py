@@ -74,4 +74,5 @@ if __name__ == "__main__":
     host = os.getenv("HOST", "0.0.0.0")
     port = int(os.getenv("PORT", 8000))
 
-    uvicorn.run(app, host=host, port=port)
+    # "auto" picks uvloop when it is installed (see requirements.txt)
+    uvicorn.run(app, host=host, port=port, loop="auto")
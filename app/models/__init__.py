@@ -2,6 +2,7 @@ from app.models.session import Session
 from app.models.task import Task, TaskStatus
 from app.models.test_case import TestCase, TestCaseType, TestCaseStatus
 from app.models.interaction import ClaudeInteraction, InteractionType
+from app.models.user_input import UserInput
 from app.models.prompt import Prompt
 from app.models.project import Project, ProjectType
 
@@ -14,6 +15,7 @@ __all__ = [
     "TestCaseStatus",
     "ClaudeInteraction",
     "InteractionType",
+    "UserInput",
     "Prompt",
     "Project",
     "ProjectType",
@@ -1,9 +1,9 @@
-from sqlalchemy import Column, String, DateTime, Text, ForeignKey, Enum, Integer, Float, JSON
+from sqlalchemy import Column, String, DateTime, Text, ForeignKey, Enum, Integer, Float, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import uuid
 import enum
-from app.database import Base
+from app.database import Base, OrjsonJSON
 
 
 class InteractionType(str, enum.Enum):
@@ -16,6 +16,10 @@ class InteractionType(str, enum.Enum):
 
 class ClaudeInteraction(Base):
     __tablename__ = "claude_interactions"
+    __table_args__ = (
+        # Serves per-task counts and "latest interaction of a type" lookups
+        Index("ix_claude_interactions_task_type_created", "task_id", "interaction_type", "created_at"),
+    )
 
     id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     task_id = Column(String(36), ForeignKey("tasks.id"), nullable=False)
@@ -24,7 +28,7 @@ class ClaudeInteraction(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
 
     # Images attached to user messages (JSON array of {"base64": "...", "media_type": "image/png"})
-    images = Column(JSON, nullable=True)
+    images = Column(OrjsonJSON, nullable=True)
 
     # Token usage tracking (from Claude CLI result event)
     input_tokens = Column(Integer, nullable=True)
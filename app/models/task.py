@@ -66,11 +66,12 @@ class Task(Base):
     # Human-in-the-loop: Custom input to override auto-generated response
     custom_human_input = Column(Text, nullable=True)
 
-    # User input queue system for high-priority input handling
-    # Format: [{"input": "message", "timestamp": "2023-...", "id": "uuid"}, ...]
+    # Legacy JSON user input queue, superseded by the user_inputs table (see UserInput).
+    # No longer written; kept so existing databases keep their schema.
     user_input_queue = Column(JSON, nullable=True)
 
-    # Quick flag to check if user input is pending (for performance)
+    # Legacy "input pending" flag. Pending state is now read from user_inputs rows
+    # (see UserInputManager.has_pending_input); no longer written.
     user_input_pending = Column(Boolean, default=False, nullable=False)
 
     # Flag to prevent duplicate processing when immediate processing is active
@@ -105,6 +106,9 @@ class Task(Base):
     session = relationship("Session", back_populates="tasks")
     test_cases = relationship("TestCase", back_populates="task", cascade="all, delete-orphan")
     interactions = relationship("ClaudeInteraction", back_populates="task", cascade="all, delete-orphan")
+    user_inputs = relationship(
+        "UserInput", back_populates="task", cascade="all, delete-orphan", order_by="UserInput.created_at"
+    )
 
     @property
     def interaction_count(self):
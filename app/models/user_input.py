@@ -0,0 +1,40 @@
+from sqlalchemy import Column, String, DateTime, Text, ForeignKey, Boolean, Index
+from sqlalchemy.dialects import mysql
+from sqlalchemy.orm import relationship, deferred
+from datetime import datetime
+import uuid
+from app.database import Base, OrjsonJSON
+
+
+class UserInput(Base):
+    """A user message queued for a task, consumed in FIFO order."""
+
+    __tablename__ = "user_inputs"
+    __table_args__ = (
+        # Serves "next pending input" and duplicate lookups for a task
+        Index("ix_user_inputs_task_status_created", "task_id", "status", "created_at"),
+        # Serves the recent-duplicate check without comparing full input texts
+        Index("ix_user_inputs_task_hash_created", "task_id", "input_hash", "created_at"),
+    )
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    task_id = Column(String(36), ForeignKey("tasks.id"), nullable=False)
+    input = Column(Text, nullable=False)
+    input_hash = Column(String(32), nullable=False)  # MD5 hex digest of the UTF-8 input
+
+    # Images attached to the message (JSON array of {"base64": "...", "media_type": "image/png"}).
+    # Deferred so that queue lookups and status queries don't load the base64 payloads;
+    # the calls that hand the message to Claude undefer it.
+    images = deferred(Column(OrjsonJSON, nullable=True))
+
+    # Delivery status: pending -> sent
+    status = Column(String(20), default="pending", nullable=False)
+    # Kept for backward compatibility with the deprecated get_next_user_input()
+    processed = Column(Boolean, default=False, nullable=False)
+
+    # Microsecond precision keeps FIFO order for inputs queued within one second
+    created_at = Column(DateTime().with_variant(mysql.DATETIME(fsp=6), "mysql"), default=datetime.utcnow, nullable=False)
+    sent_at = Column(DateTime, nullable=True)
+    processed_at = Column(DateTime, nullable=True)
+
+    task = relationship("Task", back_populates="user_inputs")
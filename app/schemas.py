@@ -40,6 +40,7 @@ class TaskCreate(BaseModel):
     end_criteria: Optional[str] = None  # Success criteria description
     max_iterations: Optional[int] = 20  # Maximum conversation iterations
     max_tokens: Optional[int] = None  # Maximum cumulative output tokens
+    max_wall_seconds: Optional[int] = None  # Maximum wall-clock seconds per execution run
 
     # Multi-project configuration
     # Format: [
@@ -8,6 +8,11 @@ import shutil
 class GitWorktreeManager:
     """Manages git worktrees for parallel task execution."""
 
+    # Paths already confirmed to be git repositories, shared by all managers.
+    # Only positive results are cached. An entry is dropped when a git command
+    # run there fails or its worktree is removed, so the next check asks git.
+    _known_repos = set()
+
     def __init__(self, base_repo_path: str):
         """
         Initialize worktree manager for a repository.
@@ -91,6 +96,7 @@ class GitWorktreeManager:
                     )
 
                 if result.returncode != 0:
+                    self.forget_git_repo(self.base_repo_path)
                     return False, "", f"Failed to create worktree: {result.stderr}"
             else:
                 # Create worktree on current branch or base_branch
@@ -110,6 +116,7 @@ class GitWorktreeManager:
                 )
 
                 if result.returncode != 0:
+                    self.forget_git_repo(self.base_repo_path)
                     return False, "", f"Failed to create worktree: {result.stderr}"
 
                 branch_name = task_branch
@@ -117,8 +124,10 @@ class GitWorktreeManager:
             return True, worktree_path, f"Created worktree for branch '{branch_name}' from '{base_branch or 'HEAD'}'"
 
         except subprocess.TimeoutExpired:
+            self.forget_git_repo(self.base_repo_path)
             return False, "", "Git worktree command timed out"
         except Exception as e:
+            self.forget_git_repo(self.base_repo_path)
             return False, "", f"Error creating worktree: {str(e)}"
 
     def create_multi_project_worktrees(
@@ -307,6 +316,9 @@ class GitWorktreeManager:
         elif "Successfully committed" in commit_msg:
             commit_messages.append(f"Committed changes: {commit_msg}")
 
+        # The worktree is going away; don't answer for its path from the cache
+        self.forget_git_repo(worktree_path)
+
         try:
             cmd = ["git", "worktree", "remove", worktree_path]
             if force:
@@ -503,6 +515,7 @@ class GitWorktreeManager:
             )
 
             if result.returncode != 0:
+                self.forget_git_repo(self.base_repo_path)
                 return []
 
             worktrees = []
@@ -529,6 +542,7 @@ class GitWorktreeManager:
             return worktrees
 
         except Exception:
+            self.forget_git_repo(self.base_repo_path)
             return []
 
     def cleanup_worktrees(self) -> Tuple[int, str]:
@@ -576,6 +590,8 @@ class GitWorktreeManager:
 
     def _is_git_repo(self, path: str) -> bool:
         """Check if path is a git repository."""
+        if self.is_known_git_repo(path):
+            return True
         try:
             result = subprocess.run(
                 ["git", "rev-parse", "--git-dir"],
@@ -583,10 +599,28 @@ class GitWorktreeManager:
                 capture_output=True,
                 timeout=5
             )
-            return result.returncode == 0
+            if result.returncode == 0:
+                self.remember_git_repo(path)
+                return True
+            return False
         except Exception:
             return False
 
+    @classmethod
+    def is_known_git_repo(cls, path: str) -> bool:
+        """Check if path was already confirmed to be a git repository."""
+        return os.path.abspath(path) in cls._known_repos
+
+    @classmethod
+    def remember_git_repo(cls, path: str):
+        """Record that path is a git repository so later checks skip git."""
+        cls._known_repos.add(os.path.abspath(path))
+
+    @classmethod
+    def forget_git_repo(cls, path: str):
+        """Drop path from the cache so the next check runs git again."""
+        cls._known_repos.discard(os.path.abspath(path))
+
     def _get_current_branch(self, path: str) -> Optional[str]:
         """Get current branch name."""
         try:
@@ -9,6 +9,7 @@ import shlex
 import tempfile
 import base64
 import os
+import orjson
 from typing import Optional, Callable, List, Dict, Tuple
 
 logger = logging.getLogger(__name__)
@@ -127,61 +128,69 @@ class StreamingCLIClient:
         extracted_session_id = session_id  # Keep the passed session_id or will extract from stream
         usage_data = None  # Will be populated from result event
 
-        # Read stdout line by line in real-time using async
-        async for line_bytes in process.stdout:
-            # Decode bytes to string
-            line = line_bytes.decode('utf-8').strip()
-            if not line:
-                continue
+        try:
+            # Read stdout line by line in real-time using async
+            async for line_bytes in process.stdout:
+                # orjson parses the raw bytes directly, so lines are not decoded first
+                line = line_bytes.strip()
+                if not line:
+                    continue
 
-            try:
-                # Parse NDJSON line
-                event = json.loads(line)
-
-                # Call event callback for every event (allows real-time interaction saving)
-                if event_callback:
-                    event_callback(event)
-
-                # Extract session_id from system init event (first message in stream)
-                if event.get('type') == 'system' and event.get('subtype') == 'init':
-                    extracted_session_id = event.get('session_id')
-
-                # Extract content from assistant messages
-                if event.get('type') == 'assistant':
-                    message = event.get('message', {})
-                    content = message.get('content', [])
-
-                    # Extract text from content blocks
-                    for block in content:
-                        if block.get('type') == 'text':
-                            text_chunk = block.get('text', '')
-                            full_text.append(text_chunk)
-
-                            # Call callback with text
-                            if output_callback:
-                                output_callback(text_chunk)
-
-                # Handle 'result' type for final output (this is authoritative)
-                elif event.get('type') == 'result':
-                    result_text = event.get('result', '')
-                    # The result contains the final assembled text - this is what we should use!
-                    # Clear full_text and use the result instead
-                    if result_text:
-                        full_text = [result_text]
-
-                    # Extract usage data from result event
-                    usage_data = {
-                        'duration_ms': event.get('duration_ms'),
-                        'cost_usd': event.get('total_cost_usd'),
-                        'usage': event.get('usage', {})
-                    }
-
-            except json.JSONDecodeError:
-                # Skip non-JSON lines
-                pass
-
-        # Wait for process to complete and check return code
-        await process.wait()
+                try:
+                    # Parse NDJSON line
+                    event = orjson.loads(line)
+
+                    # Call event callback for every event (allows real-time interaction saving)
+                    if event_callback:
+                        event_callback(event)
+
+                    # Extract session_id from system init event (first message in stream)
+                    if event.get('type') == 'system' and event.get('subtype') == 'init':
+                        extracted_session_id = event.get('session_id')
+
+                    # Extract content from assistant messages
+                    if event.get('type') == 'assistant':
+                        message = event.get('message', {})
+                        content = message.get('content', [])
+
+                        # Extract text from content blocks
+                        for block in content:
+                            if block.get('type') == 'text':
+                                text_chunk = block.get('text', '')
+                                full_text.append(text_chunk)
+
+                                # Call callback with text
+                                if output_callback:
+                                    output_callback(text_chunk)
+
+                    # Handle 'result' type for final output (this is authoritative)
+                    elif event.get('type') == 'result':
+                        result_text = event.get('result', '')
+                        # The result contains the final assembled text - this is what we should use!
+                        # Clear full_text and use the result instead
+                        if result_text:
+                            full_text = [result_text]
+
+                        # Extract usage data from result event
+                        usage_data = {
+                            'duration_ms': event.get('duration_ms'),
+                            'cost_usd': event.get('total_cost_usd'),
+                            'usage': event.get('usage', {})
+                        }
+
+                except orjson.JSONDecodeError:
+                    # Skip non-JSON lines
+                    pass
+
+            # Wait for process to complete and check return code
+            await process.wait()
+        except asyncio.CancelledError:
+            # Don't leave the CLI running when the caller gives up (e.g. a task time limit)
+            if process.returncode is None:
+                self._kill_process_tree(process)
+                await process.wait()
+            self._cleanup_temp_files(temp_image_files)
+            raise
 
         if process.returncode != 0:
             # Read any stderr output
@@ -210,6 +219,16 @@ class StreamingCLIClient:
         full_output = ''.join(full_text).strip()
         return (full_output, pid, extracted_session_id, usage_data)
 
+    def _kill_process_tree(self, process):
+        """Kill the shell process and the CLI it started."""
+        import subprocess
+        # The CLI runs as a child of the shell, so kill the children first
+        subprocess.run(["pkill", "-KILL", "-P", str(process.pid)], capture_output=True)
+        try:
+            process.kill()
+        except ProcessLookupError:
+            pass
+
     def _cleanup_temp_files(self, temp_files: List[str]):
         """Clean up temporary image files."""
         for temp_path in temp_files:
@@ -1,5 +1,6 @@
 import asyncio
 from typing import List, Dict, Optional
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session as DBSession
 from app.database import SessionLocal
 from app.models import (
@@ -13,19 +14,74 @@ from app.models import (
     Session,
 )
 from app.services.streaming_cli_client import StreamingCLIClient
-from app.services.simulated_human import SimulatedHuman
-from app.services.intelligent_responder import IntelligentResponder
-from app.services.test_runner import TestRunner
-from app.services.criteria_analyzer import CriteriaAnalyzer
 from app.services.user_input_manager import UserInputManager
 from datetime import datetime
+import collections
+import functools
 import re
 import os
 import json
 import logging
+import subprocess
+import time
 
 logger = logging.getLogger(__name__)
 
+# Planning response parsing
+_PLANNING_BLOCK_RE = re.compile(r'```planning\s*(.*?)\s*```', re.DOTALL | re.IGNORECASE)
+_NEEDS_WRITE_RE = re.compile(r'NEEDS_WRITE:\s*(YES|NO)', re.IGNORECASE)
+_WRITE_TARGET_LINE_RE = re.compile(r'WRITE_TARGETS?:\s*(.+)', re.IGNORECASE)
+_NUMBER_RE = re.compile(r'\d+')
+_WRITE_TARGETS_RE = re.compile(r'```write_targets\s*(.*?)\s*```', re.DOTALL | re.IGNORECASE)
+_MODULE_NUM_RE = re.compile(r'^\[?(\d+)\]?[.):]?\s*$')
+
+# Branch name sanitization
+_NON_BRANCH_CHAR_RE = re.compile(r'[^a-zA-Z0-9_\-]')
+_UNDERSCORES_RE = re.compile(r'_+')
+
+# Number of trailing response characters searched for completion phrases
+_COMPLETION_TAIL_CHARS = 4096
+
+# Phrases in Claude's response that indicate the task is complete
+_COMPLETION_INDICATORS = (
+    "implementation is complete",
+    "task is complete",
+    "finished implementing",
+    "implementation done",
+    "completed the task",
+    "all done",
+    "implementation summary",
+    "successfully implemented",
+)
+_COMPLETION_RE = re.compile("|".join(map(re.escape, _COMPLETION_INDICATORS)), re.IGNORECASE)
+
+# Summary sections in Claude's response, tried in order
+_SUMMARY_PATTERNS = tuple(
+    re.compile(pattern, re.IGNORECASE | re.DOTALL)
+    for pattern in (
+        r"summary:?\s*(.+?)(?:\n\n|\Z)",
+        r"implementation summary:?\s*(.+?)(?:\n\n|\Z)",
+        r"what (?:i've|i have) done:?\s*(.+?)(?:\n\n|\Z)",
+    )
+)
+
+# Streamed interactions are flushed once this many are buffered or this many
+# seconds have passed, whichever comes first
+_EVENT_FLUSH_BATCH_SIZE = 16
+_EVENT_FLUSH_INTERVAL = 0.25
+
+# Decision-phase input checks query the queue at least this often (seconds)
+# even without a signal, to pick up input queued by other processes
+_INPUT_POLL_INTERVAL = 30.0
+
+
+@functools.lru_cache(maxsize=4096)
+def _task_branch_name(task_name: str) -> str:
+    """Derive the task branch name (task/<sanitized name>) from a task name."""
+    sanitized_name = _NON_BRANCH_CHAR_RE.sub('_', task_name)
+    sanitized_name = _UNDERSCORES_RE.sub('_', sanitized_name).strip('_')
+    return f"task/{sanitized_name}"
+
 
 class TaskExecutor:
     """Executes tasks asynchronously with Claude CLI interaction."""
@@ -35,10 +91,7 @@ class TaskExecutor:
         cli_cmd = cli_command or os.getenv("CLAUDE_CLI_COMMAND", "claude")
         # Only use streaming client now - it has session support and no timeouts
         self.streaming_client = StreamingCLIClient(cli_command=cli_cmd)
-        self.simulated_human = SimulatedHuman()
-        self.intelligent_responder = IntelligentResponder()
-        self.test_runner = TestRunner()
-        self.criteria_analyzer = CriteriaAnalyzer(cli_command=cli_cmd)
+        self.cli_command = cli_cmd
         self.user_input_manager = UserInputManager()
         self.max_iterations = 20
         self.max_pauses = 5
@@ -47,6 +100,101 @@ class TaskExecutor:
         from app.services.git_worktree import GitWorktreeManager
         self.git_worktree_manager_class = GitWorktreeManager
 
+        # Task ID -> time.monotonic() of the last input queue query
+        self._input_queried_at = {}
+
+    # Services below are only needed on some execution paths (work mode,
+    # ending criteria, test generation), so they are imported and built on
+    # first use rather than for every executor
+
+    @functools.cached_property
+    def simulated_human(self):
+        from app.services.simulated_human import SimulatedHuman
+        return SimulatedHuman()
+
+    @functools.cached_property
+    def intelligent_responder(self):
+        from app.services.intelligent_responder import IntelligentResponder
+        return IntelligentResponder()
+
+    @functools.cached_property
+    def test_runner(self):
+        from app.services.test_runner import TestRunner
+        return TestRunner()
+
+    @functools.cached_property
+    def criteria_analyzer(self):
+        from app.services.criteria_analyzer import CriteriaAnalyzer
+        return CriteriaAnalyzer(cli_command=self.cli_command)
+
+    async def _run_db(self, operation, *args, **kwargs):
+        """
+        Run a blocking database operation in a worker thread.
+
+        Every query, commit and refresh on the executor's session goes
+        through here, so the event loop stays free for the streaming
+        subprocess and other tasks. The session is only used by one
+        operation at a time: the executor awaits each call before the next.
+
+        A worker thread cannot be interrupted, so when the caller is cancelled
+        (e.g. by the wall-clock limit) this waits for the operation to finish
+        before the cancellation propagates. Whoever handles it can then use
+        the session without racing the thread.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(None, functools.partial(operation, *args, **kwargs))
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            while not future.done():
+                try:
+                    await asyncio.wait([future])
+                except asyncio.CancelledError:
+                    pass
+            raise
+
+    async def _next_pending_input(self, db: DBSession, task: Task, input_event: Optional[asyncio.Event],
+                                  claim: bool = True, signalled_only: bool = False) -> tuple:
+        """
+        Get the next pending user input.
+
+        With signalled_only, the query is skipped unless input_event is set or
+        _INPUT_POLL_INTERVAL seconds have passed since the last one, since only
+        input added through this process's UserInputManager sets the event.
+        Callers that pause or end the task on an empty result must not use it.
+
+        Args:
+            db: Database session
+            task: Task object
+            input_event: Event set by UserInputManager when input is queued,
+                or None if the task has no listener
+            claim: Mark the input as sent in the same step; pass False to only
+                look at it
+            signalled_only: Skip the query when no new input is expected
+
+        Returns:
+            Tuple of (input_text, images), or (None, None) if nothing is pending
+        """
+        if input_event is not None:
+            now = time.monotonic()
+            last_query = self._input_queried_at.get(task.id)
+            if (signalled_only and not input_event.is_set() and last_query is not None
+                    and now - last_query < _INPUT_POLL_INTERVAL):
+                return None, None
+            input_event.clear()
+            self._input_queried_at[task.id] = now
+
+        if claim:
+            lookup = self.user_input_manager.pop_next_pending_user_input
+        else:
+            lookup = self.user_input_manager.get_next_pending_user_input_with_images
+        pending_input, pending_images = await self._run_db(lookup, db, task.id)
+        if pending_input and input_event is not None:
+            # More input may be queued behind this one (or, when only peeking,
+            # this one is still pending)
+            input_event.set()
+        return pending_input, pending_images
+
     async def execute_task(self, task_id: str):
         """
         Execute a task asynchronously.
@@ -59,9 +207,12 @@ class TaskExecutor:
         """
         print(f"🔧 Task {task_id}: Starting execution", flush=True)
         logger.info(f"Task {task_id}: Starting execution")
-        db = SessionLocal()
+        # Attributes are not expired on commit, so reading them afterwards does not
+        # query the database on the event loop; the chat loop refreshes the task
+        # explicitly to see changes made by the API
+        db = SessionLocal(expire_on_commit=False)
         try:
-            task = db.query(Task).filter(Task.id == task_id).first()
+            task = await self._run_db(db.get, Task, task_id)
             if not task:
                 logger.error(f"Task {task_id}: Not found")
                 return
@@ -70,15 +221,15 @@ class TaskExecutor:
 
             # Update task status
             task.status = TaskStatus.RUNNING
-            db.commit()
+            await self._run_db(db.commit)
 
             # Determine initial project path (worktree creation happens dynamically in _execute_with_claude)
-            project_path = self._get_initial_project_path(db, task)
+            project_path = await self._run_db(self._get_initial_project_path, db, task)
 
             if not project_path:
                 task.status = TaskStatus.FAILED
                 task.error_message = "No valid project path found"
-                db.commit()
+                await self._run_db(db.commit)
                 return
 
             print(f"📂 Task {task.id}: Initial project path: {project_path}", flush=True)
@@ -86,22 +237,29 @@ class TaskExecutor:
 
             # Execute the task with Claude (planning and worktree handled inside)
             print(f"🎬 Task {task.id}: Calling _execute_with_claude", flush=True)
-            await self._execute_with_claude(db, task, project_path)
+            input_event = self.user_input_manager.register_input_listener(task.id)
+            try:
+                await self._execute_with_claude(db, task, project_path)
+            finally:
+                self.user_input_manager.unregister_input_listener(task.id, input_event)
+                self._input_queried_at.pop(task.id, None)
             print(f"✅ Task {task.id}: _execute_with_claude completed", flush=True)
 
         except Exception as e:
             logger.error(f"Task {task_id}: Execution failed: {e}")
-            task = db.query(Task).filter(Task.id == task_id).first()
+            # The failed operation may have left the transaction unusable
+            await self._run_db(db.rollback)
+            task = await self._run_db(db.get, Task, task_id)
             if task:
                 task.status = TaskStatus.FAILED
                 task.error_message = str(e)
-                db.commit()
+                await self._run_db(db.commit)
         finally:
             db.close()
 
     def _get_initial_project_path(self, db: DBSession, task: Task) -> Optional[str]:
         """
-        Determine the initial project path for a task.
+        Determine the initial project path for a task. Runs in a worker thread.
 
         This is the starting point - worktree creation happens dynamically
         in _execute_with_claude when write access is needed.
@@ -139,7 +297,7 @@ class TaskExecutor:
 
         # Priority 4: Session project_path
         if task.session_id:
-            session = db.query(Session).filter(Session.id == task.session_id).first()
+            session = db.get(Session, task.session_id)
             if session and hasattr(session, 'project_path') and session.project_path:
                 if os.path.exists(session.project_path):
                     logger.info(f"Task {task.id}: Using session project_path: {session.project_path}")
@@ -164,7 +322,7 @@ class TaskExecutor:
             task: Task to execute
             project_path: Path to the project (may change to worktree)
         """
-        print(f"🎯 Task {task.id}: _execute_with_claude started, project_path={project_path}")
+        logger.debug("Task %s: _execute_with_claude started, project_path=%s", task.id, project_path)
         iteration = 0
         current_project_path = project_path  # Track current working path (may become worktree)
 
@@ -173,23 +331,24 @@ class TaskExecutor:
         ending_criteria = end_criteria_config.get("criteria") if not task.chat_mode else None
         max_iterations = end_criteria_config.get("max_iterations", self.max_iterations)
         max_tokens = end_criteria_config.get("max_tokens")
+        max_wall_seconds = end_criteria_config.get("max_wall_seconds")
 
         # Track cumulative tokens
         if task.total_tokens_used is None:
             task.total_tokens_used = 0
-            db.commit()
+            await self._run_db(db.commit)
 
         # Check if this is first run (no existing interactions)
-        existing_interactions = db.query(ClaudeInteraction).filter(
-            ClaudeInteraction.task_id == task.id
-        ).count()
+        existing_interactions = await self._run_db(lambda: db.scalar(
+            select(func.count()).select_from(ClaudeInteraction).where(ClaudeInteraction.task_id == task.id)
+        ))
         is_first_run = existing_interactions == 0
-        print(f"📋 Task {task.id}: is_first_run={is_first_run}, existing_interactions={existing_interactions}")
+        logger.debug("Task %s: is_first_run=%s, existing_interactions=%s", task.id, is_first_run, existing_interactions)
 
         # Update current_project_path if worktree already exists (from previous run)
         if task.worktree_path and os.path.exists(task.worktree_path):
             current_project_path = task.worktree_path
-            print(f"📂 Task {task.id}: Using existing worktree path: {current_project_path}")
+            logger.debug("Task %s: Using existing worktree path: %s", task.id, current_project_path)
 
         # ============================================================
         # INITIAL CONTEXT (runs once at task start)
@@ -199,260 +358,300 @@ class TaskExecutor:
         # the session and re-send context in the worktree.
         # ============================================================
         if is_first_run:
-            print(f"📨 Task {task.id}: Will send initial context")
+            logger.debug("Task %s: Will send initial context", task.id)
             await self._send_initial_context(db, task, current_project_path)
 
         # ============================================================
         # CHAT LOOP - Handle user messages with per-message planning
         # ============================================================
         last_response = ""
-        conversation_history = []
-
-        while iteration < max_iterations:
-            iteration += 1
-            logger.info(f"Task {task.id}: Starting iteration {iteration}")
-
-            # Check if task was stopped
-            db.refresh(task)
-            if task.status == TaskStatus.STOPPED:
-                logger.info(f"Task {task.id}: Task was stopped, breaking")
-                break
+        # Only the latest responses are given to the criteria check
+        conversation_history = collections.deque(maxlen=3)
+        input_event = self.user_input_manager.get_input_listener(task.id)
+
+        # The loop runs as its own coroutine so an optional wall-clock limit can
+        # cancel it, including a Claude call that never returns
+        async def run_chat_loop():
+            nonlocal iteration, current_project_path, last_response
+
+            while iteration < max_iterations:
+                iteration += 1
+                logger.info(f"Task {task.id}: Starting iteration {iteration}")
+
+                # Check if task was stopped
+                await self._run_db(db.refresh, task)
+                if task.status == TaskStatus.STOPPED:
+                    logger.info(f"Task {task.id}: Task was stopped, breaking")
+                    break
 
-            # Check if max tokens limit reached
-            if max_tokens and task.total_tokens_used >= max_tokens:
-                task.status = TaskStatus.EXHAUSTED
-                task.error_message = f"Max tokens limit reached: {task.total_tokens_used}/{max_tokens} tokens used"
-                db.commit()
-                break
+                # Check if max tokens limit reached
+                if max_tokens and task.total_tokens_used >= max_tokens:
+                    task.status = TaskStatus.EXHAUSTED
+                    task.error_message = f"Max tokens limit reached: {task.total_tokens_used}/{max_tokens} tokens used"
+                    await self._run_db(db.commit)
+                    break
 
-            # Get user message
-            user_message = None
-            user_images = None
+                # Get user message
+                user_message = None
+                user_images = None
 
-            pending_input, pending_images = self.user_input_manager.get_next_pending_user_input_with_images(db, task.id)
-            if pending_input:
-                self.user_input_manager.mark_message_as_sent(db, task.id, pending_input)
-                user_message = pending_input
-                user_images = pending_images
-                logger.info(f"Task {task.id}: Got user message: {user_message[:50]}...")
+                pending_input, pending_images = await self._next_pending_input(db, task, input_event)
+                if pending_input:
+                    user_message = pending_input
+                    user_images = pending_images
+                    logger.info(f"Task {task.id}: Got user message: {user_message[:50]}...")
 
-                # Save user message IMMEDIATELY so it appears before planning phase
-                self._save_interaction(db, task.id, InteractionType.USER_REQUEST, user_message, images=user_images)
-                db.commit()
-            else:
-                # No user message, wait for input in chat mode or end in work mode
-                if task.chat_mode:
-                    logger.info(f"Task {task.id}: Chat mode - waiting for user input")
-                    break
+                    # Save user message IMMEDIATELY so it appears before planning phase
+                    await self._run_db(self._save_interaction, db, task.id, InteractionType.USER_REQUEST, user_message, images=user_images)
                 else:
-                    logger.info(f"Task {task.id}: Work mode - no more input, ending")
-                    break
-
-            try:
-                # ============================================================
-                # PHASE 1: PLANNING - Determine which repos need write access
-                # ============================================================
-                logger.info(f"Task {task.id}: PHASE 1 - Planning for user message")
-
-                planning_result = await self._run_iteration_planning(
-                    db, task, current_project_path, user_message, iteration == 1
-                )
+                    # No user message, wait for input in chat mode or end in work mode
+                    if task.chat_mode:
+                        logger.info(f"Task {task.id}: Chat mode - waiting for user input")
+                        break
+                    else:
+                        logger.info(f"Task {task.id}: Work mode - no more input, ending")
+                        break
 
-                # ============================================================
-                # PHASE 2: WORKTREE SETUP - Create worktrees for ALL targets
-                # ============================================================
-                write_targets = planning_result.get('write_targets', [])
-                worktree_paths = []
-
-                if planning_result.get('needs_write') and write_targets:
-                    logger.info(f"Task {task.id}: PHASE 2 - Creating worktrees for {len(write_targets)} targets: {write_targets}")
-
-                    for write_target in write_targets:
-                        # Create worktree for each target
-                        worktree_path = await self._ensure_worktree_for_target(db, task, write_target)
-                        if worktree_path:
-                            worktree_paths.append(worktree_path)
-                            logger.info(f"Task {task.id}: Created worktree: {worktree_path}")
-
-                    # Set the first worktree as the primary execution path (for backward compat)
-                    if worktree_paths and not task.worktree_path:
-                        task.worktree_path = worktree_paths[0]
-                        current_project_path = worktree_paths[0]
-
-                        # ============================================================
-                        # CRITICAL: Clear session ID to force new session in worktree
-                        # The previous session was started in the original repo directory.
-                        # We must start a NEW session in the worktree directory so that
-                        # Claude CLI's working directory is correctly set to the worktree.
-                        # ============================================================
-                        old_session_id = task.claude_session_id
-                        task.claude_session_id = None
-                        db.commit()
-                        print(f"🔄 Task {task.id}: Worktree created, cleared session {old_session_id} to start fresh in worktree")
-                        logger.info(f"Task {task.id}: Cleared session {old_session_id} to start fresh in worktree {worktree_paths[0]}")
-
-                        # ============================================================
-                        # RE-SEND INITIAL CONTEXT in new session (in worktree)
-                        # This ensures the new session has all the project context
-                        # ============================================================
-                        print(f"📨 Task {task.id}: Re-sending initial context in worktree session")
-                        await self._send_initial_context(db, task, worktree_paths[0])
-
-                execution_path = task.worktree_path or current_project_path
-
-                # ============================================================
-                # PHASE 3: EXECUTION - Send user message to Claude
-                # ============================================================
-                logger.info(f"Task {task.id}: PHASE 3 - Executing user message")
-
-                # Build continue prompt with worktree info if created
-                if planning_result.get('needs_write') and worktree_paths:
-                    if len(worktree_paths) == 1:
-                        worktree_info = f"""Worktree created at: {worktree_paths[0]}
+                try:
+                    # ============================================================
+                    # PHASE 1: PLANNING - Determine which repos need write access
+                    # ============================================================
+                    logger.info(f"Task {task.id}: PHASE 1 - Planning for user message")
+
+                    planning_result = await self._run_iteration_planning(
+                        db, task, current_project_path, user_message, iteration == 1
+                    )
+
+                    # ============================================================
+                    # PHASE 2: WORKTREE SETUP - Create worktrees for ALL targets
+                    # ============================================================
+                    write_targets = planning_result.get('write_targets', [])
+                    worktree_paths = []
+
+                    if planning_result.get('needs_write') and write_targets:
+                        logger.info(f"Task {task.id}: PHASE 2 - Creating worktrees for {len(write_targets)} targets: {write_targets}")
+
+                        for write_target in write_targets:
+                            # Create worktree for each target
+                            worktree_path = await self._ensure_worktree_for_target(db, task, write_target)
+                            if worktree_path:
+                                worktree_paths.append(worktree_path)
+                                logger.info(f"Task {task.id}: Created worktree: {worktree_path}")
+
+                        # Set the first worktree as the primary execution path (for backward compat)
+                        if worktree_paths and not task.worktree_path:
+                            task.worktree_path = worktree_paths[0]
+                            current_project_path = worktree_paths[0]
+
+                            # ============================================================
+                            # CRITICAL: Clear session ID to force new session in worktree
+                            # The previous session was started in the original repo directory.
+                            # We must start a NEW session in the worktree directory so that
+                            # Claude CLI's working directory is correctly set to the worktree.
+                            # ============================================================
+                            old_session_id = task.claude_session_id
+                            task.claude_session_id = None
+                            await self._run_db(db.commit)
+                            logger.info(f"Task {task.id}: Cleared session {old_session_id} to start fresh in worktree {worktree_paths[0]}")
+
+                            # ============================================================
+                            # RE-SEND INITIAL CONTEXT in new session (in worktree)
+                            # This ensures the new session has all the project context
+                            # ============================================================
+                            logger.debug("Task %s: Re-sending initial context in worktree session", task.id)
+                            await self._send_initial_context(db, task, worktree_paths[0])
+
+                    execution_path = task.worktree_path or current_project_path
+
+                    # ============================================================
+                    # PHASE 3: EXECUTION - Send user message to Claude
+                    # ============================================================
+                    logger.info(f"Task {task.id}: PHASE 3 - Executing user message")
+
+                    # Build continue prompt with worktree info if created
+                    if planning_result.get('needs_write') and worktree_paths:
+                        if len(worktree_paths) == 1:
+                            worktree_info = f"""Worktree created at: {worktree_paths[0]}
 Branch: {task.branch_name or 'task branch'}
 All file changes should be made in the worktree directory."""
-                    else:
-                        worktree_list = "\n".join([f"  - {wp}" for wp in worktree_paths])
-                        worktree_info = f"""Worktrees created for {len(worktree_paths)} repositories:
+                        else:
+                            worktree_list = "\n".join([f"  - {wp}" for wp in worktree_paths])
+                            worktree_info = f"""Worktrees created for {len(worktree_paths)} repositories:
 {worktree_list}
 Branch: {task.branch_name or 'task branch'}
 All file changes should be made in the worktree directories."""
 
-                    # Save worktree info as system message so user can see it
-                    self._save_interaction(db, task.id, InteractionType.SYSTEM_MESSAGE, worktree_info)
-                    db.commit()
+                        # Save worktree info as system message so user can see it
+                        await self._run_db(self._save_interaction, db, task.id, InteractionType.SYSTEM_MESSAGE, worktree_info)
 
-                    continue_prompt = f"""{worktree_info}
+                        continue_prompt = f"""{worktree_info}
 
 Now proceed with the original request:
 {user_message}"""
-                else:
-                    continue_prompt = user_message
-
-                # Note: User message already saved before planning phase
-
-                # Execute with streaming
-                response, pid, session_id, usage_data = await self._execute_iteration(
-                    db, task, execution_path, continue_prompt, user_images
-                )
-
-                # Clear images after first use
-                user_images = None
-
-                # Update task state
-                if session_id:
-                    task.claude_session_id = session_id
-                task.process_pid = pid
-                db.commit()
-
-                # Update token usage
-                if usage_data and 'usage' in usage_data:
-                    output_tokens = usage_data['usage'].get('output_tokens', 0)
-                    task.total_tokens_used = (task.total_tokens_used or 0) + output_tokens
-                    db.commit()
-
-                last_response = response
-                conversation_history.append(response)
-                is_first_iteration = False
-
-                # ============================================================
-                # PHASE 4: DECISION - Determine next action
-                # ============================================================
-                logger.info(f"Task {task.id}: PHASE 4 - Decision")
-
-                # Check ending criteria (work mode only)
-                if ending_criteria:
-                    try:
-                        criteria_met, reasoning = await self.criteria_analyzer.check_task_completion(
-                            ending_criteria=ending_criteria,
-                            task_description=task.description,
-                            conversation_history="\n\n".join(conversation_history[-3:]),
-                            latest_response=last_response
+                    else:
+                        continue_prompt = user_message
+
+                    # Note: User message already saved before planning phase
+
+                    # Execute with streaming
+                    response, pid, session_id, usage_data = await self._execute_iteration(
+                        db, task, execution_path, continue_prompt, user_images
+                    )
+
+                    # Clear images after first use
+                    user_images = None
+
+                    # Update task state and token usage
+                    if session_id:
+                        task.claude_session_id = session_id
+                    task.process_pid = pid
+                    if usage_data and 'usage' in usage_data:
+                        output_tokens = usage_data['usage'].get('output_tokens', 0)
+                        task.total_tokens_used = (task.total_tokens_used or 0) + output_tokens
+                    await self._run_db(db.commit)
+
+                    last_response = response
+                    conversation_history.append(response)
+                    is_first_iteration = False
+
+                    # ============================================================
+                    # PHASE 4: DECISION - Determine next action
+                    # ============================================================
+                    logger.info(f"Task {task.id}: PHASE 4 - Decision")
+
+                    # Check ending criteria (work mode only), looking up pending user
+                    # input while the criteria check's Claude call is in flight
+                    if ending_criteria:
+                        (criteria_met, reasoning), (pending_input, pending_images) = await asyncio.gather(
+                            self._check_ending_criteria(task, ending_criteria, conversation_history, last_response),
+                            self._next_pending_input(db, task, input_event, claim=False, signalled_only=True),
                         )
                         if criteria_met:
                             task.summary = f"Task completed - Criteria met: {reasoning}"
                             task.status = TaskStatus.FINISHED
-                            db.commit()
+                            await self._run_db(db.commit)
                             break
-                    except Exception as e:
-                        logger.warning(f"Task {task.id}: Error checking criteria: {e}")
-
-                # Check for pending user input (always priority)
-                pending_input, pending_images = self.user_input_manager.get_next_pending_user_input_with_images(db, task.id)
-
-                if pending_input:
-                    # User input takes priority
-                    self.user_input_manager.mark_message_as_sent(db, task.id, pending_input)
-                    user_message = pending_input
-                    user_images = pending_images
-                    self._save_interaction(db, task.id, InteractionType.USER_REQUEST, user_message, images=user_images)
-                    logger.info(f"Task {task.id}: Processing user input: {user_message[:50]}...")
-                    continue  # Go to next iteration with user input
-
-                # CHAT MODE: Stop and wait for user input
-                if task.chat_mode:
-                    logger.info(f"Task {task.id}: Chat mode - waiting for user input")
-                    task.status = TaskStatus.PAUSED
-                    db.commit()
-                    break
+                        # Input found while peeking is only claimed once the task continues
+                        if pending_input:
+                            pending_input, pending_images = await self._next_pending_input(db, task, input_event)
+                    else:
+                        pending_input, pending_images = await self._next_pending_input(
+                            db, task, input_event, signalled_only=True
+                        )
 
-                # WORK MODE: Use intelligent responder to decide next action
-                if not self.intelligent_responder.should_continue_conversation(last_response, iteration, max_iterations):
-                    logger.info(f"Task {task.id}: Intelligent responder says conversation complete")
-                    task.summary = self._extract_summary(last_response)
-                    db.commit()
-                    break
+                    if pending_input:
+                        # User input takes priority
+                        user_message = pending_input
+                        user_images = pending_images
+                        await self._run_db(self._save_interaction, db, task.id, InteractionType.USER_REQUEST, user_message, images=user_images)
+                        logger.info(f"Task {task.id}: Processing user input: {user_message[:50]}...")
+                        continue  # Go to next iteration with user input
+
+                    # CHAT MODE: Stop and wait for user input
+                    if task.chat_mode:
+                        # The check above may have been skipped; don't pause on input
+                        # queued without a signal. The top of the loop claims it.
+                        if await self._run_db(self.user_input_manager.has_pending_input, db, task.id):
+                            continue
+                        logger.info(f"Task {task.id}: Chat mode - waiting for user input")
+                        task.status = TaskStatus.PAUSED
+                        await self._run_db(db.commit)
+                        break
 
-                # Generate auto-response for next iteration
-                user_message = self.intelligent_responder.generate_response(
-                    claude_response=last_response,
-                    task_description=task.description,
-                    iteration=iteration
-                )
-                self._save_interaction(db, task.id, InteractionType.SIMULATED_HUMAN, user_message)
-                logger.info(f"Task {task.id}: Generated auto-response: {user_message[:50]}...")
+                    # WORK MODE: Use intelligent responder to decide next action
+                    if not self.intelligent_responder.should_continue_conversation(last_response, iteration, max_iterations):
+                        if await self._run_db(self.user_input_manager.has_pending_input, db, task.id):
+                            continue
+                        logger.info(f"Task {task.id}: Intelligent responder says conversation complete")
+                        task.summary = self._extract_summary(last_response)
+                        await self._run_db(db.commit)
+                        break
 
-            except Exception as e:
-                error_str = str(e)
-                logger.error(f"Task {task.id}: Error in iteration {iteration}: {error_str}")
+                    # Generate auto-response for next iteration
+                    user_message = self.intelligent_responder.generate_response(
+                        claude_response=last_response,
+                        task_description=task.description,
+                        iteration=iteration
+                    )
+                    await self._run_db(self._save_interaction, db, task.id, InteractionType.SIMULATED_HUMAN, user_message)
+                    logger.info(f"Task {task.id}: Generated auto-response: {user_message[:50]}...")
+
+                except Exception as e:
+                    error_str = str(e)
+                    logger.error(f"Task {task.id}: Error in iteration {iteration}: {error_str}")
+
+                    # Check for recoverable errors
+                    if "Separator is found, but chunk is longer than limit" in error_str:
+                        logger.warning(f"Task {task.id}: Chunk size limit - continuing")
+                        task.error_message = f"Error during execution: {error_str}"
+                        await self._run_db(db.commit)
+                        continue
 
-                # Check for recoverable errors
-                if "Separator is found, but chunk is longer than limit" in error_str:
-                    logger.warning(f"Task {task.id}: Chunk size limit - continuing")
                     task.error_message = f"Error during execution: {error_str}"
-                    db.commit()
-                    continue
+                    task.status = TaskStatus.FAILED
+                    await self._run_db(db.commit)
+                    break
 
-                task.error_message = f"Error during execution: {error_str}"
-                task.status = TaskStatus.FAILED
-                db.commit()
-                break
+        timed_out = False
+        try:
+            await asyncio.wait_for(run_chat_loop(), timeout=max_wall_seconds)
+        except asyncio.TimeoutError:
+            # By now any database call the loop was in has finished (see _run_db)
+            # and the Claude CLI has been killed by the streaming client. Discard
+            # the interrupted iteration's unsaved changes, or a failed transaction.
+            timed_out = True
+            logger.warning(f"Task {task.id}: Wall-clock limit of {max_wall_seconds}s reached, stopping")
+            await self._run_db(db.rollback)
+            await self._run_db(db.refresh, task)
+            task.status = TaskStatus.EXHAUSTED
+            task.error_message = f"Wall-clock limit reached: {max_wall_seconds}s"
+            await self._run_db(db.commit)
 
         # Post-loop processing
         if iteration >= max_iterations and task.status == TaskStatus.RUNNING:
             task.status = TaskStatus.EXHAUSTED
             task.error_message = f"Max iterations reached: {iteration}/{max_iterations}"
-            db.commit()
+            await self._run_db(db.commit)
         elif task.chat_mode and task.status == TaskStatus.RUNNING:
             # Chat mode ended loop waiting for user input - set to PAUSED
             task.status = TaskStatus.PAUSED
-            db.commit()
+            await self._run_db(db.commit)
             logger.info(f"Task {task.id}: Chat mode - set status to PAUSED, waiting for user input")
 
         # Extract summary if not set
         if not task.summary:
-            last_responses = db.query(ClaudeInteraction).filter(
+            last_response_row = await self._run_db(lambda: db.query(ClaudeInteraction).filter(
                 ClaudeInteraction.task_id == task.id,
                 ClaudeInteraction.interaction_type == InteractionType.CLAUDE_RESPONSE
-            ).all()
-            if last_responses:
-                task.summary = self._extract_summary(last_responses[-1].content)
-                db.commit()
-
-        # Run tests for completed work mode tasks
-        if not task.chat_mode and task.status in [TaskStatus.FINISHED, TaskStatus.COMPLETED, TaskStatus.EXHAUSTED]:
+            ).order_by(ClaudeInteraction.created_at.desc()).first())
+            if last_response_row:
+                task.summary = self._extract_summary(last_response_row.content)
+                await self._run_db(db.commit)
+
+        # Run tests for completed work mode tasks (not once the time limit is used up)
+        if (not task.chat_mode and not timed_out
+                and task.status in [TaskStatus.FINISHED, TaskStatus.COMPLETED, TaskStatus.EXHAUSTED]):
             await self._generate_and_run_tests(db, task, current_project_path)
 
+    async def _check_ending_criteria(self, task: Task, ending_criteria: str,
+                                     conversation_history: collections.deque, last_response: str) -> tuple:
+        """
+        Check whether the task's ending criteria are met.
+
+        Returns:
+            Tuple of (criteria_met, reasoning); errors count as not met
+        """
+        try:
+            return await self.criteria_analyzer.check_task_completion(
+                ending_criteria=ending_criteria,
+                task_description=task.description,
+                conversation_history="\n\n".join(conversation_history),
+                latest_response=last_response
+            )
+        except Exception as e:
+            logger.warning(f"Task {task.id}: Error checking criteria: {e}")
+            return False, None
+
     async def _send_initial_context(self, db: DBSession, task: Task, project_path: str):
         """
         Send initial context message when task starts.
@@ -468,6 +667,60 @@ Now proceed with the original request:
         print(f"📨 Task {task.id}: Sending initial context message")
         logger.info(f"Task {task.id}: Sending initial context message")
 
+        initial_message = self._build_initial_context_message(task, project_path)
+
+        try:
+            # Save initial context as SYSTEM_MESSAGE so frontend can display it while Claude processes
+            await self._run_db(self._save_interaction, db, task.id, InteractionType.SYSTEM_MESSAGE, initial_message)
+            print(f"💬 Task {task.id}: Initial context saved, sending to Claude...", flush=True)
+
+            # Send to Claude
+            print(f"📤 Task {task.id}: Calling streaming_client.send_message_streaming...", flush=True)
+            response, pid, session_id, usage_data = await self.streaming_client.send_message_streaming(
+                message=initial_message,
+                project_path=project_path,
+                session_id=task.claude_session_id,
+                mcp_servers=task.mcp_servers,
+            )
+            print(f"📥 Task {task.id}: Got response from streaming_client", flush=True)
+
+            # Update session info
+            if session_id:
+                task.claude_session_id = session_id
+            task.process_pid = pid
+
+            # Save Claude's response
+            self._save_interaction(db, task.id, InteractionType.CLAUDE_RESPONSE, response, usage_data, commit=False)
+
+            # Update token usage
+            if usage_data and 'usage' in usage_data:
+                output_tokens = usage_data['usage'].get('output_tokens', 0)
+                task.total_tokens_used = (task.total_tokens_used or 0) + output_tokens
+
+            # Session info, response and token usage are written together
+            await self._run_db(db.commit)
+
+            print(f"✅ Task {task.id}: Initial context sent successfully", flush=True)
+            logger.info(f"Task {task.id}: Initial context sent successfully")
+
+        except Exception as e:
+            print(f"❌ Task {task.id}: Failed to send initial context: {e}", flush=True)
+            logger.error(f"Task {task.id}: Failed to send initial context: {e}")
+            # Drop any half-written response so it isn't committed by a later step
+            await self._run_db(db.rollback)
+            # Don't fail the task - just log and continue
+
+    def _build_initial_context_message(self, task: Task, project_path: str) -> str:
+        """
+        Build the initial context message describing the task and its projects.
+
+        Args:
+            task: Task object
+            project_path: Current working directory
+
+        Returns:
+            Message telling Claude about the projects and to wait for instructions
+        """
         # Build context message with all projects info
         context_parts = []
 
@@ -505,46 +758,7 @@ Now proceed with the original request:
         context_parts.append("Simply acknowledge this context and wait for user instructions.")
         context_parts.append("Reply with a brief acknowledgment only.")
 
-        initial_message = "\n".join(context_parts)
-
-        try:
-            # Save initial context as SYSTEM_MESSAGE so frontend can display it while Claude processes
-            self._save_interaction(db, task.id, InteractionType.SYSTEM_MESSAGE, initial_message)
-            db.commit()
-            print(f"💬 Task {task.id}: Initial context saved, sending to Claude...", flush=True)
-
-            # Send to Claude
-            print(f"📤 Task {task.id}: Calling streaming_client.send_message_streaming...", flush=True)
-            response, pid, session_id, usage_data = await self.streaming_client.send_message_streaming(
-                message=initial_message,
-                project_path=project_path,
-                session_id=task.claude_session_id,
-                mcp_servers=task.mcp_servers,
-            )
-            print(f"📥 Task {task.id}: Got response from streaming_client", flush=True)
-
-            # Update session info
-            if session_id:
-                task.claude_session_id = session_id
-            task.process_pid = pid
-            db.commit()
-
-            # Save Claude's response
-            self._save_interaction(db, task.id, InteractionType.CLAUDE_RESPONSE, response, usage_data)
-
-            # Update token usage
-            if usage_data and 'usage' in usage_data:
-                output_tokens = usage_data['usage'].get('output_tokens', 0)
-                task.total_tokens_used = (task.total_tokens_used or 0) + output_tokens
-                db.commit()
-
-            print(f"✅ Task {task.id}: Initial context sent successfully", flush=True)
-            logger.info(f"Task {task.id}: Initial context sent successfully")
-
-        except Exception as e:
-            print(f"❌ Task {task.id}: Failed to send initial context: {e}", flush=True)
-            logger.error(f"Task {task.id}: Failed to send initial context: {e}")
-            # Don't fail the task - just log and continue
+        return "\n".join(context_parts)
 
     async def _execute_iteration(self, db: DBSession, task: Task, project_path: str,
                                   message: str, images: list = None) -> tuple:
@@ -562,27 +776,75 @@ Now proceed with the original request:
             Tuple of (response, pid, session_id, usage_data)
         """
         task.status = TaskStatus.RUNNING
-        db.commit()
+        await self._run_db(db.commit)
+
+        # Streamed interactions are buffered and written in batches rather than
+        # one commit per event. Only the flusher task writes them, so the
+        # session is never used by two worker threads at once.
+        pending_interactions = []
+        flush_requested = asyncio.Event()
+
+        def commit_interactions(batch: list):
+            db.add_all(batch)
+            db.commit()
+
+        async def flush_events():
+            if pending_interactions:
+                # Hand over a snapshot; events keep arriving while it is written
+                batch = pending_interactions[:]
+                pending_interactions.clear()
+                await self._run_db(commit_interactions, batch)
+
+        async def flush_periodically():
+            while True:
+                try:
+                    await asyncio.wait_for(flush_requested.wait(), _EVENT_FLUSH_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                flush_requested.clear()
+                await flush_events()
 
         # Event handler for real-time saves
         def handle_event(event: dict):
+            handle_stream_event(event)
+            if len(pending_interactions) >= _EVENT_FLUSH_BATCH_SIZE:
+                flush_requested.set()
+
+        # The CLI emits each content block of a message as its own event, so
+        # consecutive text blocks of one message are accumulated into one row
+        text_message_id = None
+        text_interaction = None
+
+        def handle_stream_event(event: dict):
+            nonlocal text_message_id, text_interaction
             event_type = event.get('type')
 
             if event_type == 'assistant':
                 message_data = event.get('message', {})
                 content = message_data.get('content', [])
                 text_parts = []
-                tool_uses = []
+                tool_use_count = 0
 
                 for block in content:
                     if block.get('type') == 'text':
                         text_parts.append(block.get('text', ''))
                     elif block.get('type') == 'tool_use':
-                        tool_uses.append(block)
-
-                if text_parts or tool_uses:
-                    content_str = '\n'.join(text_parts) if text_parts else f"[Tool use: {len(tool_uses)} tools]"
-                    self._save_interaction(db, task.id, InteractionType.CLAUDE_RESPONSE, content_str)
+                        tool_use_count += 1
+
+                if text_parts:
+                    content_str = '\n'.join(text_parts)
+                    message_id = message_data.get('id')
+                    if (message_id and message_id == text_message_id
+                            and pending_interactions and pending_interactions[-1] is text_interaction):
+                        text_interaction.content += '\n' + content_str
+                    else:
+                        text_interaction = self._build_interaction(task.id, InteractionType.CLAUDE_RESPONSE, content_str)
+                        text_message_id = message_id
+                        pending_interactions.append(text_interaction)
+                elif tool_use_count:
+                    pending_interactions.append(
+                        self._build_interaction(task.id, InteractionType.CLAUDE_RESPONSE, f"[Tool use: {tool_use_count} tools]")
+                    )
 
             elif event_type == 'user':
                 message_data = event.get('message', {})
@@ -609,18 +871,31 @@ Now proceed with the original request:
                             tool_results.append(f"Tool {tool_id}:\n{full_result_text}")
 
                 if tool_results:
-                    self._save_interaction(db, task.id, InteractionType.TOOL_RESULT, '\n\n'.join(tool_results))
-
-        # Send message via streaming client
-        response, pid, session_id, usage_data = await self.streaming_client.send_message_streaming(
-            message=message,
-            project_path=project_path,
-            output_callback=None,
-            session_id=task.claude_session_id,
-            event_callback=handle_event,
-            images=images,
-            mcp_servers=task.mcp_servers,
-        )
+                    pending_interactions.append(
+                        self._build_interaction(task.id, InteractionType.TOOL_RESULT, '\n\n'.join(tool_results))
+                    )
+
+        # Keep the frontend current while Claude is quiet, e.g. during long tool runs
+        flusher = asyncio.create_task(flush_periodically())
+        try:
+            # Send message via streaming client
+            response, pid, session_id, usage_data = await self.streaming_client.send_message_streaming(
+                message=message,
+                project_path=project_path,
+                output_callback=None,
+                session_id=task.claude_session_id,
+                event_callback=handle_event,
+                images=images,
+                mcp_servers=task.mcp_servers,
+            )
+        finally:
+            flusher.cancel()
+            # Let a flush already in progress finish before writing the rest
+            await asyncio.wait([flusher])
+            await flush_events()
+            if not flusher.cancelled():
+                # The flusher only stops early when a write failed
+                flusher.result()
 
         return response, pid, session_id, usage_data
 
@@ -632,9 +907,9 @@ Now proceed with the original request:
         pause_count = 0
 
         # Check if this task already has interactions (indicating a restart)
-        existing_interactions = db.query(ClaudeInteraction).filter(
+        existing_interactions = await self._run_db(lambda: db.query(ClaudeInteraction).filter(
             ClaudeInteraction.task_id == task.id
-        ).count()
+        ).count())
 
         is_first_message = existing_interactions == 0
         logger.info(f"Task {task.id}: existing_interactions={existing_interactions}, is_first_message={is_first_message}")
@@ -648,7 +923,7 @@ Now proceed with the original request:
         # Track cumulative tokens
         if task.total_tokens_used is None:
             task.total_tokens_used = 0
-            db.commit()
+            await self._run_db(db.commit)
 
         # Get project context (using simple file-based fallback)
         project_context = self._get_project_context(project_path, task)
@@ -656,18 +931,17 @@ Now proceed with the original request:
         # Build comprehensive initial message
         initial_message = self._build_comprehensive_initial_message(task, project_context)
 
-        # Check for pending user input at startup
-        user_input, user_images = self.user_input_manager.get_next_pending_user_input_with_images(db, task.id)
+        # Check for pending user input at startup (claimed as sent in the same step)
+        user_input, user_images = await self._run_db(self.user_input_manager.pop_next_pending_user_input, db, task.id)
 
         if user_input:
-            self.user_input_manager.mark_message_as_sent(db, task.id, user_input)
-            self._save_interaction(db, task.id, InteractionType.USER_REQUEST, user_input, images=user_images)
-            db.commit()  # Commit immediately so frontend can display
+            await self._run_db(self._save_interaction, db, task.id, InteractionType.USER_REQUEST, user_input, images=user_images)
+            await self._run_db(db.commit)  # Commit immediately so frontend can display
             initial_message = user_input
             is_first_message = True
         elif is_first_message:
-            self._save_interaction(db, task.id, InteractionType.USER_REQUEST, initial_message)
-            db.commit()  # Commit immediately so frontend can display
+            await self._run_db(self._save_interaction, db, task.id, InteractionType.USER_REQUEST, initial_message)
+            await self._run_db(db.commit)  # Commit immediately so frontend can display
         else:
             is_first_message = False
 
@@ -678,14 +952,14 @@ Now proceed with the original request:
         while iteration < max_iterations:
             iteration += 1
 
-            db.refresh(task)
+            await self._run_db(db.refresh, task)
             if task.status == TaskStatus.STOPPED:
                 break
 
             if max_tokens and task.total_tokens_used >= max_tokens:
                 task.status = TaskStatus.EXHAUSTED
                 task.error_message = f"Max tokens limit reached"
-                db.commit()
+                await self._run_db(db.commit)
                 break
 
             try:
@@ -693,12 +967,12 @@ Now proceed with the original request:
                     message_to_send = initial_message
                     is_first_message = False
                 else:
-                    db.refresh(task)
-                    has_pending_user_input = self.user_input_manager.has_pending_input(db, task.id)
+                    await self._run_db(db.refresh, task)
+                    has_pending_user_input = await self._run_db(self.user_input_manager.has_pending_input, db, task.id)
 
                     if task.chat_mode and not has_pending_user_input:
                         task.status = TaskStatus.PAUSED
-                        db.commit()
+                        await self._run_db(db.commit)
                         break
 
                     if not has_pending_user_input and not self.intelligent_responder.should_continue_conversation(
@@ -708,21 +982,20 @@ Now proceed with the original request:
 
                     if pause_count < self.max_pauses:
                         task.status = TaskStatus.PAUSED
-                        db.commit()
+                        await self._run_db(db.commit)
                         await asyncio.sleep(1)
-                        db.refresh(task)
+                        await self._run_db(db.refresh, task)
 
-                        user_input, user_images = self.user_input_manager.get_next_pending_user_input_with_images(db, task.id)
+                        user_input, user_images = await self._run_db(self.user_input_manager.pop_next_pending_user_input, db, task.id)
 
                         if user_input:
-                            self.user_input_manager.mark_message_as_sent(db, task.id, user_input)
                             human_prompt = user_input
                             current_images = user_images
-                            self._save_interaction(db, task.id, InteractionType.USER_REQUEST, human_prompt, images=user_images)
-                            db.commit()  # Commit immediately so frontend can display
+                            await self._run_db(self._save_interaction, db, task.id, InteractionType.USER_REQUEST, human_prompt, images=user_images)
+                            await self._run_db(db.commit)  # Commit immediately so frontend can display
                         elif task.chat_mode:
                             task.status = TaskStatus.PAUSED
-                            db.commit()
+                            await self._run_db(db.commit)
                             break
                         else:
                             human_prompt = self.intelligent_responder.generate_response(
@@ -731,12 +1004,12 @@ Now proceed with the original request:
                                 iteration=iteration
                             )
                             current_images = None
-                            self._save_interaction(db, task.id, InteractionType.SIMULATED_HUMAN, human_prompt)
+                            await self._run_db(self._save_interaction, db, task.id, InteractionType.SIMULATED_HUMAN, human_prompt)
 
                         message_to_send = human_prompt
                         images_to_send = current_images
                         task.status = TaskStatus.RUNNING
-                        db.commit()
+                        await self._run_db(db.commit)
                         pause_count += 1
                     else:
                         # Max pauses reached, stop
@@ -745,14 +1018,14 @@ Now proceed with the original request:
             except Exception as e:
                 task.error_message = f"Error during execution: {str(e)}"
                 task.status = TaskStatus.FAILED
-                db.commit()
+                await self._run_db(db.commit)
                 break
 
         # Post-loop processing for legacy method
         if iteration >= max_iterations and task.status == TaskStatus.RUNNING:
             task.status = TaskStatus.EXHAUSTED
             task.error_message = f"Max iterations reached"
-            db.commit()
+            await self._run_db(db.commit)
 
     def _build_comprehensive_initial_message(self, task, project_context: str) -> str:
         """
@@ -823,15 +1096,17 @@ Now proceed with the original request:
         logger.info(f"Task {task.id}: Running iteration planning phase")
 
         # Build projects info from task.projects
-        projects_info = ""
-        projects_list = ""
         if task.projects:
+            info_parts = []
+            list_parts = []
             for i, proj in enumerate(task.projects, 1):
                 path = proj.get('path', 'unknown')
                 context = proj.get('context', 'No description')
                 access = proj.get('access', 'read')
-                projects_info += f"[{i}] {path}\n    Description: {context}\n    Current Access: {access}\n\n"
-                projects_list += f"[{i}] {path}\n"
+                info_parts.append(f"[{i}] {path}\n    Description: {context}\n    Current Access: {access}\n\n")
+                list_parts.append(f"[{i}] {path}\n")
+            projects_info = "".join(info_parts)
+            projects_list = "".join(list_parts)
         else:
             # Fallback to single project path
             projects_info = f"[1] {project_path}\n    Description: Main project\n    Current Access: read\n\n"
@@ -922,8 +1197,7 @@ Brief explanation, then proceed with implementation."""
 
         try:
             # Save planning message as SYSTEM_MESSAGE (not user message)
-            self._save_interaction(db, task.id, InteractionType.SYSTEM_MESSAGE, planning_prompt)
-            db.commit()
+            await self._run_db(self._save_interaction, db, task.id, InteractionType.SYSTEM_MESSAGE, planning_prompt)
 
             # Send planning message to Claude
             response, pid, session_id, usage_data = await self.streaming_client.send_message_streaming(
@@ -933,20 +1207,16 @@ Brief explanation, then proceed with implementation."""
                 mcp_servers=task.mcp_servers,
             )
 
-            # Update session info
+            # Update session info and token usage
             if session_id:
                 task.claude_session_id = session_id
             task.process_pid = pid
-            db.commit()
-
-            # Save Claude's response
-            self._save_interaction(db, task.id, InteractionType.CLAUDE_RESPONSE, response, usage_data)
-
-            # Update token usage
             if usage_data and 'usage' in usage_data:
                 output_tokens = usage_data['usage'].get('output_tokens', 0)
                 task.total_tokens_used = (task.total_tokens_used or 0) + output_tokens
-                db.commit()
+
+            # Save Claude's response (commits the task updates above in the same transaction)
+            await self._run_db(self._save_interaction, db, task.id, InteractionType.CLAUDE_RESPONSE, response, usage_data)
 
             # Parse planning response - now supports multiple write targets
             needs_write = False
@@ -960,20 +1230,19 @@ Brief explanation, then proceed with implementation."""
                     projects_lookup[i] = proj.get('path', '')
 
             # Look for planning block
-            pattern = r'```planning\s*(.*?)\s*```'
-            match = re.search(pattern, response, re.DOTALL | re.IGNORECASE)
+            match = _PLANNING_BLOCK_RE.search(response)
 
             if match:
                 planning_text = match.group(1).strip()
 
                 # Parse NEEDS_WRITE
-                needs_write_match = re.search(r'NEEDS_WRITE:\s*(YES|NO)', planning_text, re.IGNORECASE)
+                needs_write_match = _NEEDS_WRITE_RE.search(planning_text)
                 if needs_write_match:
                     needs_write = needs_write_match.group(1).upper() == 'YES'
 
                 # Parse WRITE_TARGETS (plural) - can be comma-separated numbers, NONE, or CURRENT
                 # Also support legacy WRITE_TARGET (singular)
-                write_target_match = re.search(r'WRITE_TARGETS?:\s*(.+)', planning_text, re.IGNORECASE)
+                write_target_match = _WRITE_TARGET_LINE_RE.search(planning_text)
                 if write_target_match:
                     target_str = write_target_match.group(1).strip()
 
@@ -986,12 +1255,14 @@ Brief explanation, then proceed with implementation."""
                     else:
                         # Parse comma-separated numbers (e.g., "1, 2, 3" or "1,2,3" or "[1], [2]")
                         # Find all numbers in the string
-                        numbers = re.findall(r'\d+', target_str)
+                        numbers = _NUMBER_RE.findall(target_str)
+                        seen_paths = set()
                         for num_str in numbers:
                             num = int(num_str)
                             if num in projects_lookup:
                                 path = projects_lookup[num]
-                                if path and path not in write_targets:
+                                if path and path not in seen_paths:
+                                    seen_paths.add(path)
                                     write_targets.append(path)
                                     write_target_nums.append(num)
                                     logger.info(f"Task {task.id}: Write target {num} -> {path}")
@@ -1112,10 +1383,14 @@ Brief explanation, then proceed with implementation."""
             branch_name = task.branch_name or f"task/{task.task_name}"
             base_branch = task.base_branch or "main"
 
-            success, worktree_path, message = worktree_manager.create_worktree(
-                task_name=task.task_name,
-                branch_name=branch_name,
-                base_branch=base_branch
+            success, worktree_path, message = await asyncio.get_running_loop().run_in_executor(
+                None,
+                functools.partial(
+                    worktree_manager.create_worktree,
+                    task_name=task.task_name,
+                    branch_name=branch_name,
+                    base_branch=base_branch
+                )
             )
 
             if success and worktree_path:
@@ -1124,7 +1399,7 @@ Brief explanation, then proceed with implementation."""
                 # Update task branch name if not already set
                 if not task.branch_name:
                     task.branch_name = branch_name
-                    db.commit()
+                    await self._run_db(db.commit)
 
                 return worktree_path
             else:
@@ -1172,17 +1447,21 @@ Brief explanation, then proceed with implementation."""
 
             # Create worktree
             logger.info(f"Task {task.id}: Creating worktree for branch {branch_name} from {base_branch}")
-            success, worktree_path, message = worktree_manager.create_worktree(
-                task_name=task.task_name,
-                branch_name=branch_name,
-                base_branch=base_branch
+            success, worktree_path, message = await asyncio.get_running_loop().run_in_executor(
+                None,
+                functools.partial(
+                    worktree_manager.create_worktree,
+                    task_name=task.task_name,
+                    branch_name=branch_name,
+                    base_branch=base_branch
+                )
             )
 
             if success and worktree_path and os.path.exists(worktree_path):
                 # Update task with worktree info
                 task.worktree_path = worktree_path
                 task.branch_name = branch_name
-                db.commit()
+                await self._run_db(db.commit)
 
                 logger.info(f"Task {task.id}: Created worktree at {worktree_path}")
                 return worktree_path
@@ -1578,11 +1857,27 @@ will not reflect your IDL changes and the service will fail.
         return config_info
 
     def _save_interaction(
-        self, db: DBSession, task_id: str, interaction_type: InteractionType, content: str, usage_data: Optional[Dict] = None, images: Optional[List[Dict]] = None
+        self, db: DBSession, task_id: str, interaction_type: InteractionType, content: str, usage_data: Optional[Dict] = None, images: Optional[List[Dict]] = None,
+        commit: bool = True
     ):
-        """Save an interaction to the database with optional usage data and images."""
+        """
+        Save an interaction to the database with optional usage data and images.
+
+        Pass commit=False when the caller commits other changes right after, so
+        both are written in one transaction.
+        """
+        db.add(self._build_interaction(task_id, interaction_type, content, usage_data, images))
+        if commit:
+            db.commit()
+
+    def _build_interaction(
+        self, task_id: str, interaction_type: InteractionType, content: str, usage_data: Optional[Dict] = None, images: Optional[List[Dict]] = None
+    ) -> ClaudeInteraction:
+        """Build an unsaved interaction with optional usage data and images."""
+        # Stamp creation time now so batched inserts keep their event order
         interaction = ClaudeInteraction(
-            task_id=task_id, interaction_type=interaction_type, content=content, images=images
+            task_id=task_id, interaction_type=interaction_type, content=content, images=images,
+            created_at=datetime.utcnow(),
         )
 
         # Add usage data if available (from Claude CLI result event)
@@ -1596,8 +1891,7 @@ will not reflect your IDL changes and the service will fail.
             interaction.cache_creation_tokens = usage.get('cache_creation_input_tokens')
             interaction.cache_read_tokens = usage.get('cache_read_input_tokens')
 
-        db.add(interaction)
-        db.commit()
+        return interaction
 
     def _is_task_complete(self, response: str) -> bool:
         """
@@ -1609,19 +1903,8 @@ will not reflect your IDL changes and the service will fail.
         Returns:
             True if task appears complete
         """
-        completion_indicators = [
-            "implementation is complete",
-            "task is complete",
-            "finished implementing",
-            "implementation done",
-            "completed the task",
-            "all done",
-            "implementation summary",
-            "successfully implemented",
-        ]
-
-        response_lower = response.lower()
-        return any(indicator in response_lower for indicator in completion_indicators)
+        # Completion phrases land at the end of a response, so only the tail is scanned
+        return _COMPLETION_RE.search(response, max(len(response) - _COMPLETION_TAIL_CHARS, 0)) is not None
 
     def _extract_summary(self, response: str) -> str:
         """
@@ -1634,14 +1917,8 @@ will not reflect your IDL changes and the service will fail.
             Extracted summary
         """
         # Try to find summary section
-        summary_patterns = [
-            r"(?i)summary:?\s*(.+?)(?:\n\n|\Z)",
-            r"(?i)implementation summary:?\s*(.+?)(?:\n\n|\Z)",
-            r"(?i)what (?:i've|i have) done:?\s*(.+?)(?:\n\n|\Z)",
-        ]
-
-        for pattern in summary_patterns:
-            match = re.search(pattern, response, re.DOTALL)
+        for pattern in _SUMMARY_PATTERNS:
+            match = pattern.search(response)
             if match:
                 return match.group(1).strip()[:500]  # Limit to 500 chars
 
@@ -1663,7 +1940,7 @@ will not reflect your IDL changes and the service will fail.
             project_path: Path to the project
         """
         task.status = TaskStatus.TESTING
-        db.commit()
+        await self._run_db(db.commit)
 
         try:
             # Generate test cases using Claude CLI (with streaming client and session continuity)
@@ -1689,11 +1966,10 @@ Return the test code you created."""
             if returned_session_id:
                 task.claude_session_id = returned_session_id
             task.process_pid = pid
-            db.commit()
 
             # Save test generation interaction with usage data
             self._save_interaction(
-                db, task.id, InteractionType.CLAUDE_RESPONSE, test_code, usage_data
+                db, task.id, InteractionType.CLAUDE_RESPONSE, test_code, usage_data, commit=False
             )
 
             # Validate test code
@@ -1710,24 +1986,31 @@ Return the test code you created."""
                     status=TestCaseStatus.PENDING,
                 )
                 db.add(test_case)
-                db.commit()
 
-                # Run the test
-                success, output = await self.test_runner.run_test(test_code, project_path)
+            # Session, interaction and pending test case are written together
+            await self._run_db(db.commit)
+
+            if is_valid:
+                # Run the generated test alongside the regression tests; they share no state
+                (success, output), (regression_passed, regression_output, _) = await asyncio.gather(
+                    self.test_runner.run_test(test_code, project_path),
+                    self.test_runner.run_regression_tests(project_path),
+                )
 
+                # Committed together with the final task status below
                 test_case.status = TestCaseStatus.PASSED if success else TestCaseStatus.FAILED
                 test_case.output = output
-                db.commit()
-
-            # Run regression tests if they exist
-            regression_passed, regression_output, _ = await self.test_runner.run_regression_tests(
-                project_path
-            )
+            else:
+                # Run regression tests if they exist
+                regression_passed, regression_output, _ = await self.test_runner.run_regression_tests(
+                    project_path
+                )
 
-            # Determine final task status
+            # Determine final task status (test cases are loaded off the event loop)
+            test_cases = await self._run_db(lambda: task.test_cases) if is_valid else []
             all_tests_passed = (
                 is_valid
-                and all(tc.status == TestCaseStatus.PASSED for tc in task.test_cases)
+                and all(tc.status == TestCaseStatus.PASSED for tc in test_cases)
                 and regression_passed
             )
 
@@ -1738,12 +2021,12 @@ Return the test code you created."""
                 task.status = TaskStatus.FAILED
                 task.error_message = "Some tests failed"
 
-            db.commit()
+            await self._run_db(db.commit)
 
         except Exception as e:
             task.status = TaskStatus.FAILED
             task.error_message = f"Error during testing: {str(e)}"
-            db.commit()
+            await self._run_db(db.commit)
 
     def _get_primary_project_path(self, task, session) -> str:
         """
@@ -1765,6 +2048,26 @@ Return the test code you created."""
             logger.info(f"Task {task.id}: Using task worktree path: {task.worktree_path}")
             return task.worktree_path
 
+        # Resolved paths are cached on the task object for the rest of its execution
+        cached_path = getattr(task, '_primary_project_path', None)
+        if cached_path:
+            return cached_path
+
+        primary_path = self._resolve_primary_project_path(task, session)
+        task._primary_project_path = primary_path
+        return primary_path
+
+    def _resolve_primary_project_path(self, task, session) -> str:
+        """
+        Resolve the primary project path for a task without a worktree_path.
+
+        Args:
+            task: Task object with projects configuration
+            session: Session object with fallback path
+
+        Returns:
+            Path to the primary project working directory
+        """
         # CRITICAL FIX: For multi-project tasks with write access, construct worktree path
         if task.projects and len(task.projects) > 0:
             primary_project = task.projects[0]
@@ -1779,8 +2082,8 @@ Return the test code you created."""
                     # Expected worktree structure: {main_repo}/.claude_worktrees/{task_name}
                     worktree_path = os.path.join(main_repo_path, ".claude_worktrees", task.task_name)
 
-                    # Validate that the worktree exists
-                    if os.path.exists(worktree_path) and os.path.isdir(worktree_path):
+                    # Validate that the worktree exists (isdir is False for missing paths, so one stat suffices)
+                    if os.path.isdir(worktree_path):
                         logger.info(f"Task {task.id}: Using constructed worktree path for write-access: {worktree_path}")
                         return worktree_path
                     else:
@@ -1815,7 +2118,6 @@ Return the test code you created."""
             Dict with 'success' boolean and optional 'error' message
         """
         import os
-        import subprocess
 
         # Use parsed modules if available, otherwise fall back to projects config
         if hasattr(task, '_parsed_modules') and task._parsed_modules:
@@ -1851,8 +2153,8 @@ Return the test code you created."""
             if not worktree_path:
                 continue
 
-            # Validate worktree exists
-            if not os.path.exists(worktree_path) or not os.path.isdir(worktree_path):
+            # Validate worktree exists (isdir is False for missing paths, so one stat suffices)
+            if not os.path.isdir(worktree_path):
                 return {
                     "success": False,
                     "error": f"Module worktree path not found: {worktree_path} (module: {module_path})"
@@ -1970,15 +2272,23 @@ Return the test code you created."""
         # Store parsed modules in task for later use
         task._parsed_modules = modules
 
+        # Nothing can become a write target when every project is configured read-only,
+        # so skip the planning round-trip to Claude entirely
+        if all(project.get('access') == 'read' for project in task.projects):
+            logger.info(f"Task {task.id}: All projects are read-only - skipping planning phase")
+            return []
+
         # Build planning prompt with individual modules - use numbered list with exact paths
-        modules_info = ""
-        modules_list = ""
+        info_parts = []
+        list_parts = []
         for i, module in enumerate(modules, 1):
             path = module.get('path', 'unknown')
             module_name = module.get('module_name', 'unknown')
             context = module.get('context', 'No context')
-            modules_info += f"[{i}] {path}\n    Name: {module_name}\n    Context: {context}\n\n"
-            modules_list += f"[{i}] {path}\n"
+            info_parts.append(f"[{i}] {path}\n    Name: {module_name}\n    Context: {context}\n\n")
+            list_parts.append(f"[{i}] {path}\n")
+        modules_info = "".join(info_parts)
+        modules_list = "".join(list_parts)
 
         planning_prompt = f"""PLANNING PHASE - Analyze this task and identify which modules need modification.
 
@@ -2016,8 +2326,7 @@ Do NOT make any file changes yet - this is only the planning phase."""
 
         try:
             # Save planning message as SYSTEM_MESSAGE (not user message)
-            self._save_interaction(db, task.id, InteractionType.SYSTEM_MESSAGE, planning_prompt)
-            db.commit()
+            await self._run_db(self._save_interaction, db, task.id, InteractionType.SYSTEM_MESSAGE, planning_prompt)
 
             # Send planning message to Claude
             response, pid, session_id, usage_data = await self.streaming_client.send_message_streaming(
@@ -2031,10 +2340,9 @@ Do NOT make any file changes yet - this is only the planning phase."""
             if session_id:
                 task.claude_session_id = session_id
             task.process_pid = pid
-            db.commit()
 
-            # Save Claude's response
-            self._save_interaction(db, task.id, InteractionType.CLAUDE_RESPONSE, response, usage_data)
+            # Save Claude's response (commits the session update above in the same transaction)
+            await self._run_db(self._save_interaction, db, task.id, InteractionType.CLAUDE_RESPONSE, response, usage_data)
 
             # Parse write targets from response (use parsed modules)
             write_targets = self._parse_write_targets(response, modules)
@@ -2062,44 +2370,57 @@ Do NOT make any file changes yet - this is only the planning phase."""
         """
         write_targets = []
 
-        # Look for write_targets block
-        pattern = r'```write_targets\s*(.*?)\s*```'
-        match = re.search(pattern, response, re.DOTALL | re.IGNORECASE)
-
-        if match:
-            targets_text = match.group(1).strip()
-            if targets_text.upper() != 'NONE':
-                # Parse module numbers
-                for line in targets_text.split('\n'):
-                    line = line.strip()
-                    if not line or line.startswith('#'):
-                        continue
-
-                    # Try to extract number from the line
-                    # Handle formats like "1", "[1]", "1.", "1)", etc.
-                    num_match = re.search(r'^\[?(\d+)\]?[.):]?\s*$', line)
-                    if num_match:
-                        module_num = int(num_match.group(1))
-                        # Convert 1-indexed to 0-indexed
-                        module_idx = module_num - 1
-                        if 0 <= module_idx < len(modules):
-                            module_path = modules[module_idx].get('path', '')
-                            if module_path and module_path not in write_targets:
-                                write_targets.append(module_path)
-                                logger.info(f"Planning: Module {module_num} ({module_path}) needs write access")
-                        else:
-                            logger.warning(f"Planning: Invalid module number {module_num}, max is {len(modules)}")
-                    else:
-                        # Fallback: try to match as path
-                        for module in modules:
-                            module_path = module.get('path', '')
-                            if line == module_path or module_path.endswith('/' + line):
-                                if module_path not in write_targets:
-                                    write_targets.append(module_path)
-                                    logger.info(f"Planning: Module path {module_path} needs write access")
-                                break
-        else:
+        # Look for write_targets block (no code fence means there is no block to scan for)
+        match = _WRITE_TARGETS_RE.search(response) if '```' in response else None
+        if not match:
             logger.warning("Planning: No write_targets block found in response")
+            return write_targets
+
+        targets_text = match.group(1).strip()
+        if not targets_text or targets_text.upper() == 'NONE':
+            return write_targets
+
+        num_modules = len(modules)
+        seen = set()
+
+        # Index module paths by basename for the path fallback below. A line can only
+        # match paths sharing its last component, so each lookup is a single dict hit.
+        paths_by_basename = {}
+        for module in modules:
+            module_path = module.get('path', '')
+            paths_by_basename.setdefault(module_path.rsplit('/', 1)[-1], []).append(module_path)
+
+        # Parse module numbers
+        for line in targets_text.split('\n'):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+
+            # Try to extract number from the line
+            # Handle formats like "1", "[1]", "1.", "1)", etc.
+            num_match = _MODULE_NUM_RE.search(line)
+            if num_match:
+                module_num = int(num_match.group(1))
+                # Convert 1-indexed to 0-indexed
+                module_idx = module_num - 1
+                if 0 <= module_idx < num_modules:
+                    module_path = modules[module_idx].get('path', '')
+                    if module_path and module_path not in seen:
+                        seen.add(module_path)
+                        write_targets.append(module_path)
+                        logger.info(f"Planning: Module {module_num} ({module_path}) needs write access")
+                else:
+                    logger.warning(f"Planning: Invalid module number {module_num}, max is {num_modules}")
+            else:
+                # Fallback: try to match as path
+                suffix = '/' + line
+                for module_path in paths_by_basename.get(line.rsplit('/', 1)[-1], ()):
+                    if line == module_path or module_path.endswith(suffix):
+                        if module_path not in seen:
+                            seen.add(module_path)
+                            write_targets.append(module_path)
+                            logger.info(f"Planning: Module path {module_path} needs write access")
+                        break
 
         return write_targets
 
@@ -2125,18 +2446,14 @@ Do NOT make any file changes yet - this is only the planning phase."""
             return worktree_map
 
         # Generate branch name from task (used for all modules)
-        branch_name = task.branch_name
-        if not branch_name:
-            sanitized_name = re.sub(r'[^a-zA-Z0-9_\-]', '_', task.task_name)
-            sanitized_name = re.sub(r'_+', '_', sanitized_name).strip('_')
-            branch_name = f"task/{sanitized_name}"
+        branch_name = task.branch_name or _task_branch_name(task.task_name)
 
         logger.info(f"Task {task.id}: Creating worktrees for {len(write_targets)} modules with branch '{branch_name}'")
 
+        repo_paths = []
         for module_path in write_targets:
             try:
                 # Check if it's a git repo
-                import subprocess
                 result = subprocess.run(
                     ["git", "rev-parse", "--git-dir"],
                     cwd=module_path,
@@ -2144,42 +2461,53 @@ Do NOT make any file changes yet - this is only the planning phase."""
                     text=True,
                     timeout=5
                 )
+            except Exception as e:
+                logger.error(f"Task {task.id}: Error creating worktree for module {module_path}: {e}")
+                continue
 
-                if result.returncode != 0:
-                    logger.warning(f"Task {task.id}: {module_path} is not a git repo, skipping worktree")
-                    continue
+            if result.returncode != 0:
+                logger.warning(f"Task {task.id}: {module_path} is not a git repo, skipping worktree")
+                continue
 
-                # Create worktree for this module
-                git_manager = self.git_worktree_manager_class(module_path)
+            repo_paths.append(module_path)
 
-                # Use task name for worktree (creates worktree at {module}/.claude_worktrees/{task_name})
-                success, worktree_path, message = git_manager.create_worktree(
-                    task.task_name,
-                    branch_name,
-                    task.base_branch
+        # Modules are independent repos, so their worktrees are created concurrently
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(
+            *[
+                loop.run_in_executor(
+                    None, self._create_single_worktree, module_path, task.task_name, branch_name, task.base_branch
                 )
+                for module_path in repo_paths
+            ],
+            return_exceptions=True
+        )
 
-                if success:
-                    worktree_map[module_path] = worktree_path
-                    logger.info(f"Task {task.id}: Created worktree for module {module_path} -> {worktree_path}")
-
-                    # Update parsed modules if available
-                    if hasattr(task, '_parsed_modules') and task._parsed_modules:
-                        for module in task._parsed_modules:
-                            if module.get('path') == module_path:
-                                module['access'] = 'write'
-                                module['worktree_path'] = worktree_path
-                                break
-                else:
-                    logger.error(f"Task {task.id}: Failed to create worktree for module {module_path}: {message}")
+        for module_path, result in zip(repo_paths, results):
+            if isinstance(result, Exception):
+                logger.error(f"Task {task.id}: Error creating worktree for module {module_path}: {result}")
+                continue
 
-            except Exception as e:
-                logger.error(f"Task {task.id}: Error creating worktree for module {module_path}: {e}")
+            success, worktree_path, message = result
+            if not success:
+                logger.error(f"Task {task.id}: Failed to create worktree for module {module_path}: {message}")
+                continue
+
+            worktree_map[module_path] = worktree_path
+            logger.info(f"Task {task.id}: Created worktree for module {module_path} -> {worktree_path}")
+
+            # Update parsed modules if available
+            if hasattr(task, '_parsed_modules') and task._parsed_modules:
+                for module in task._parsed_modules:
+                    if module.get('path') == module_path:
+                        module['access'] = 'write'
+                        module['worktree_path'] = worktree_path
+                        break
 
         # Update task with worktree info
         if worktree_map:
             # Use first worktree as primary working path
-            task.worktree_path = list(worktree_map.values())[0]
+            task.worktree_path = next(iter(worktree_map.values()))
             task.branch_name = branch_name
 
             # Store all worktree mappings in task for reference
@@ -2187,7 +2515,24 @@ Do NOT make any file changes yet - this is only the planning phase."""
                 task._worktree_map = {}
             task._worktree_map.update(worktree_map)
 
-            db.commit()
+            await self._run_db(db.commit)
             logger.info(f"Task {task.id}: Created {len(worktree_map)} worktrees, primary: {task.worktree_path}")
 
         return worktree_map
+
+    def _create_single_worktree(self, module_path: str, task_name: str, branch_name: str,
+                                base_branch: Optional[str]) -> tuple:
+        """
+        Create the worktree for one module. Runs in a worker thread.
+
+        Args:
+            module_path: Path to the module's git repository
+            task_name: Task name (worktree is created at {module}/.claude_worktrees/{task_name})
+            branch_name: Branch to check out in the worktree
+            base_branch: Branch to branch off from
+
+        Returns:
+            Tuple of (success, worktree_path, message) from GitWorktreeManager.create_worktree
+        """
+        git_manager = self.git_worktree_manager_class(module_path)
+        return git_manager.create_worktree(task_name, branch_name, base_branch)
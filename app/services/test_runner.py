@@ -1,13 +1,56 @@
-import subprocess
+import asyncio
 import os
+import re
+import signal
 import tempfile
-from typing import Tuple, List
+from typing import List, Optional, Tuple
 from pathlib import Path
 
+# Common pytest options. The cache plugin only adds startup I/O here and
+# would leave .pytest_cache behind in the task worktree.
+_PYTEST_BASE_ARGS = ("-v", "--tb=short", "-p", "no:cacheprovider")
+
+# Outcome words looked for in the raw regression output
+_PASSED_RE = re.compile(rb"passed", re.IGNORECASE)
+_FAILED_RE = re.compile(rb"failed", re.IGNORECASE)
+
 
 class TestRunner:
     """Runs pytest test cases and returns results."""
 
+    @staticmethod
+    async def _run_pytest(args: List[str], cwd: Optional[str], timeout: float) -> Tuple[int, bytes, bytes]:
+        """
+        Run pytest without blocking the event loop.
+
+        Returns:
+            Tuple of (returncode, stdout, stderr) with the output left undecoded
+
+        Raises:
+            asyncio.TimeoutError: pytest did not finish within timeout; the
+                process and anything it spawned have been killed and reaped
+        """
+        process = await asyncio.create_subprocess_exec(
+            "pytest", *args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            cwd=cwd,
+            start_new_session=True,
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            # Kill the whole session; a surviving child would keep the pipes open
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            # Reap pytest so it doesn't linger as a zombie
+            await process.wait()
+            raise
+
+        return process.returncode, stdout, stderr
+
     @staticmethod
     async def run_test(test_code: str, project_path: str) -> Tuple[bool, str]:
         """
@@ -21,37 +64,27 @@ class TestRunner:
             Tuple of (success: bool, output: str)
         """
         try:
-            # Create temporary test file
-            with tempfile.NamedTemporaryFile(
-                mode="w",
-                suffix="_test.py",
-                delete=False,
-                dir=project_path if os.path.exists(project_path) else None,
-            ) as f:
+            # The test file has to live in the project so pytest picks up its
+            # conftest.py and imports; only fall back to tmpfs without a project
+            cwd = project_path if os.path.isdir(project_path) else None
+            test_dir = cwd or ("/dev/shm" if os.path.isdir("/dev/shm") else None)
+
+            # Create temporary test file, removed when the block exits
+            with tempfile.NamedTemporaryFile(mode="w", suffix="_test.py", dir=test_dir) as f:
                 f.write(test_code)
-                test_file = f.name
+                f.flush()
 
-            try:
                 # Run pytest on the test file
-                result = subprocess.run(
-                    ["pytest", test_file, "-v", "--tb=short"],
-                    capture_output=True,
-                    text=True,
-                    timeout=60,
-                    cwd=project_path if os.path.exists(project_path) else None,
+                returncode, stdout, stderr = await TestRunner._run_pytest(
+                    [f.name, *_PYTEST_BASE_ARGS], cwd=cwd, timeout=60
                 )
 
-                output = f"STDOUT:\n{result.stdout}\n\nSTDERR:\n{result.stderr}"
-                success = result.returncode == 0
-
-                return success, output
+            output = f"STDOUT:\n{stdout.decode(errors='replace')}\n\nSTDERR:\n{stderr.decode(errors='replace')}"
+            success = returncode == 0
 
-            finally:
-                # Clean up temporary file
-                if os.path.exists(test_file):
-                    os.unlink(test_file)
+            return success, output
 
-        except subprocess.TimeoutExpired:
+        except asyncio.TimeoutError:
             return False, "Test execution timed out after 60 seconds"
         except Exception as e:
             return False, f"Error running test: {str(e)}"
@@ -74,27 +107,26 @@ class TestRunner:
                 return True, "No regression tests found", []
 
             # Run all tests in the tests directory
-            result = subprocess.run(
-                ["pytest", tests_dir, "-v", "--tb=short", "--json-report", "--json-report-file=/tmp/test_report.json"],
-                capture_output=True,
-                text=True,
-                timeout=300,
+            returncode, stdout, stderr = await TestRunner._run_pytest(
+                [tests_dir, *_PYTEST_BASE_ARGS, "--json-report", "--json-report-file=/tmp/test_report.json"],
                 cwd=project_path,
+                timeout=300,
             )
 
-            output = f"STDOUT:\n{result.stdout}\n\nSTDERR:\n{result.stderr}"
-            all_passed = result.returncode == 0
+            stdout_text = stdout.decode(errors="replace")
+            output = f"STDOUT:\n{stdout_text}\n\nSTDERR:\n{stderr.decode(errors='replace')}"
+            all_passed = returncode == 0
 
             # Parse test results (simplified)
             test_results = []
-            if "passed" in result.stdout.lower():
-                test_results.append({"status": "passed", "output": result.stdout})
-            elif "failed" in result.stdout.lower():
-                test_results.append({"status": "failed", "output": result.stdout})
+            if _PASSED_RE.search(stdout):
+                test_results.append({"status": "passed", "output": stdout_text})
+            elif _FAILED_RE.search(stdout):
+                test_results.append({"status": "failed", "output": stdout_text})
 
             return all_passed, output, test_results
 
-        except subprocess.TimeoutExpired:
+        except asyncio.TimeoutError:
             return False, "Regression tests timed out after 300 seconds", []
         except Exception as e:
             return False, f"Error running regression tests: {str(e)}", []
@@ -5,21 +5,141 @@ This replaces the race-condition prone custom_human_input system with a robust
 queue-based approach that ensures user input is never overlooked.
 """
 
+import asyncio
+import collections
+import contextlib
+import hashlib
 import json
+import threading
+import time
 import uuid
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 from typing import List, Optional, Dict, Any, Tuple
-from sqlalchemy.orm import Session
-from app.models import Task, InteractionType
+from sqlalchemy import exists, func, update
+from sqlalchemy.orm import Session, undefer
+from app.models import Task, InteractionType, UserInput
 from app.models.interaction import ClaudeInteraction
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Identical inputs submitted within this window are rejected as duplicates
+DUPLICATE_WINDOW = timedelta(seconds=30)
+
+# Number of recently queued inputs remembered per task for the in-process duplicate check
+_RECENT_INPUTS_PER_TASK = 64
+
+# Times pop_next_pending_user_input retries when the entry it read is claimed concurrently
+_CLAIM_ATTEMPTS = 5
+
+
+def _input_hash(user_input: str) -> str:
+    """Digest stored in UserInput.input_hash (matches MySQL's MD5() of the text)."""
+    return hashlib.md5(user_input.encode("utf-8")).hexdigest()
+
+
+# Long-lived event loop (on a daemon thread) that runs immediate-processing sends
+_background_loop: Optional[asyncio.AbstractEventLoop] = None
+_background_loop_lock = threading.Lock()
+
+
+def _get_background_loop() -> asyncio.AbstractEventLoop:
+    """Return the shared background loop, starting its thread on first use."""
+    global _background_loop
+    with _background_loop_lock:
+        if _background_loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=loop.run_forever, name="user-input-sender", daemon=True
+            ).start()
+            _background_loop = loop
+        return _background_loop
+
 
 class UserInputManager:
     """Manages user input queue with high priority and no race conditions."""
 
+    # Running executors register an event per task here; it is set whenever new
+    # input is committed so they only query the queue when there is something new
+    _input_listeners: Dict[str, Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = {}
+
+    @classmethod
+    def register_input_listener(cls, task_id: str) -> asyncio.Event:
+        """
+        Register the running executor of a task for new-input notifications.
+
+        The returned event starts set so the first check reads any input that
+        was queued before the executor started.
+        """
+        event = asyncio.Event()
+        event.set()
+        cls._input_listeners[task_id] = (asyncio.get_running_loop(), event)
+        return event
+
+    @classmethod
+    def unregister_input_listener(cls, task_id: str, event: asyncio.Event) -> None:
+        """Remove a task's listener if it is still the registered one."""
+        listener = cls._input_listeners.get(task_id)
+        if listener and listener[1] is event:
+            del cls._input_listeners[task_id]
+
+    @classmethod
+    def get_input_listener(cls, task_id: str) -> Optional[asyncio.Event]:
+        """Return the registered new-input event for a task, if any."""
+        listener = cls._input_listeners.get(task_id)
+        return listener[1] if listener else None
+
+    # Inputs queued by this process per task: input hash -> monotonic time queued.
+    # Answers repeated submissions without a query; misses fall through to the database.
+    _recent_inputs: Dict[str, "collections.OrderedDict[str, float]"] = {}
+    _recent_inputs_lock = threading.Lock()
+
+    @classmethod
+    def _remember_input(cls, task_id: str, input_hash: str) -> None:
+        """Record an input that was just committed to a task's queue."""
+        with cls._recent_inputs_lock:
+            recent = cls._recent_inputs.setdefault(task_id, collections.OrderedDict())
+            recent.pop(input_hash, None)
+            recent[input_hash] = time.monotonic()
+            if len(recent) > _RECENT_INPUTS_PER_TASK:
+                recent.popitem(last=False)
+
+    @classmethod
+    def _recently_remembered(cls, task_id: str, input_hash: str) -> bool:
+        """Whether this process queued the input for the task within DUPLICATE_WINDOW."""
+        cutoff = time.monotonic() - DUPLICATE_WINDOW.total_seconds()
+        with cls._recent_inputs_lock:
+            recent = cls._recent_inputs.get(task_id)
+            if not recent:
+                return False
+            # Entries are in insertion order, so expired ones are at the front
+            while recent and next(iter(recent.values())) <= cutoff:
+                recent.popitem(last=False)
+            if not recent:
+                del cls._recent_inputs[task_id]
+                return False
+            return input_hash in recent
+
+    @classmethod
+    def forget_recent_inputs(cls, task_id: str) -> None:
+        """Drop the in-process duplicate history of a task whose queue was cleared."""
+        with cls._recent_inputs_lock:
+            cls._recent_inputs.pop(task_id, None)
+
+    @classmethod
+    def _notify_input_listener(cls, task_id: str) -> None:
+        """Wake the executor of a task, from any thread."""
+        listener = cls._input_listeners.get(task_id)
+        if not listener:
+            return
+        loop, event = listener
+        try:
+            loop.call_soon_threadsafe(event.set)
+        except RuntimeError:
+            # The executor's loop has already shut down
+            pass
+
     @staticmethod
     def add_user_input(db: Session, task_id: str, user_input: str, auto_commit: bool = True, use_separate_session: bool = False, images: List[Dict[str, str]] = None) -> bool:
         """
@@ -34,108 +154,113 @@ class UserInputManager:
         Returns:
             True if successfully added, False otherwise
         """
-        try:
-            print(f"🔍 UserInputManager DEBUG: Starting add_user_input for task {task_id}, use_separate_session={use_separate_session}")
-
-            # Use separate session if requested to avoid transaction conflicts
-            if use_separate_session:
-                from app.database import SessionLocal
-                separate_db = SessionLocal()
-                print(f"🔍 UserInputManager DEBUG: Using separate database session")
-                working_db = separate_db
-            else:
-                working_db = db
+        logger.debug("Task %s: add_user_input started, use_separate_session=%s", task_id, use_separate_session)
+
+        # Use separate session if requested to avoid transaction conflicts;
+        # it is closed (and any uncommitted work discarded) when the block exits
+        if use_separate_session:
+            from app.database import SessionLocal
+            session_scope = SessionLocal()
+        else:
+            session_scope = contextlib.nullcontext(db)
+
+        with session_scope as working_db:
+            try:
+                task = working_db.get(Task, task_id)
+                if not task:
+                    logger.error(f"Task {task_id} not found")
+                    return False
+
+                logger.debug("Task %s: Found task %s", task_id, task.task_name)
+
+                # The entry's timestamp and the duplicate cutoff come from one clock read
+                now = datetime.utcnow()
+                input_hash = _input_hash(user_input)
+
+                # Check for recent duplicates to prevent spam (same logic as REST endpoint)
+                if UserInputManager.is_recent_duplicate(working_db, task_id, user_input, input_hash=input_hash, now=now):
+                    logger.info("Task %s: Duplicate input blocked, already sent within 30 seconds: %.50s...", task_id, user_input)
+                    return False  # Duplicate detected, don't add
+
+                # Create new input entry (status: pending -> sent)
+                entry_id = str(uuid.uuid4())
+                input_entry = UserInput(
+                    id=entry_id,
+                    task_id=task_id,
+                    input=user_input,
+                    input_hash=input_hash,
+                    created_at=now,
+                )
 
-            task = working_db.query(Task).filter(Task.id == task_id).first()
-            if not task:
-                print(f"❌ UserInputManager DEBUG: Task {task_id} not found")
-                logger.error(f"Task {task_id} not found")
-                if use_separate_session:
-                    separate_db.close()
-                return False
+                # Store images if provided (format: [{"base64": "...", "media_type": "image/png"}, ...])
+                if images and len(images) > 0:
+                    input_entry.images = images
+                    logger.debug("Task %s: Added %d images to input entry", task_id, len(images))
 
-            print(f"🔍 UserInputManager DEBUG: Found task {task.task_name}")
-            print(f"🔍 UserInputManager DEBUG: Current queue: {task.user_input_queue}")
+                logger.debug("Task %s: Created input entry %s: %.50s...", task_id, entry_id, user_input)
 
-            # Initialize queue if it doesn't exist
-            if not task.user_input_queue:
-                task.user_input_queue = []
-                print(f"🔍 UserInputManager DEBUG: Initialized empty queue")
+                # Add to queue
+                working_db.add(input_entry)
 
-            # Check for recent duplicates to prevent spam (same logic as REST endpoint)
-            from datetime import timedelta
-            current_queue = task.user_input_queue or []
-            recent_cutoff = datetime.utcnow() - timedelta(seconds=30)  # 30 second window
+                if auto_commit:
+                    working_db.commit()
+                    logger.debug("Task %s: Committed input entry %s", task_id, entry_id)
+                    UserInputManager._remember_input(task_id, input_hash)
+                    UserInputManager._notify_input_listener(task_id)
+                else:
+                    logger.debug("Task %s: Skipping commit (auto_commit=False)", task_id)
 
-            for entry in current_queue:
-                try:
-                    entry_time = datetime.fromisoformat(entry.get("timestamp", "1970-01-01T00:00:00"))
-                    entry_input = entry.get("input", "")
-                    if entry_time > recent_cutoff and entry_input == user_input:
-                        print(f"🚫 UserInputManager DUPLICATE BLOCKED: '{user_input[:50]}...' was already sent within 30 seconds")
-                        if use_separate_session:
-                            separate_db.close()
-                        return False  # Duplicate detected, don't add
-                except Exception as e:
-                    print(f"⚠️ UserInputManager WARNING: Error parsing timestamp in queue entry: {e}")
-                    continue
-
-            # Create new input entry
-            input_entry = {
-                "id": str(uuid.uuid4()),
-                "input": user_input,
-                "timestamp": datetime.utcnow().isoformat(),
-                "status": "pending",  # pending -> sent -> processed
-                "processed": False  # Keep for backward compatibility
-            }
-
-            # Store images if provided (format: [{"base64": "...", "media_type": "image/png"}, ...])
-            if images and len(images) > 0:
-                input_entry["images"] = images
-                print(f"🖼️ UserInputManager DEBUG: Added {len(images)} images to input entry")
-
-            print(f"🔍 UserInputManager DEBUG: Created input entry: {input_entry}")
-
-            # Add to queue
-            current_queue = task.user_input_queue or []
-            print(f"🔍 UserInputManager DEBUG: Current queue before append: {current_queue}")
-            current_queue.append(input_entry)
-            print(f"🔍 UserInputManager DEBUG: Current queue after append: {current_queue}")
-
-            # CRITICAL: Create new list object so SQLAlchemy detects the change
-            task.user_input_queue = list(current_queue)
-            task.user_input_pending = True
-
-            # Also mark the field as modified to ensure SQLAlchemy persists it
-            from sqlalchemy.orm.attributes import flag_modified
-            flag_modified(task, 'user_input_queue')
-            print(f"🔍 UserInputManager DEBUG: Set task.user_input_queue to: {task.user_input_queue} and flagged as modified")
-
-            if auto_commit:
-                print(f"🔍 UserInputManager DEBUG: About to commit...")
-                working_db.commit()
-                print(f"✅ UserInputManager DEBUG: Commit successful")
-
-                # Verify commit by re-querying database
-                verification_task = working_db.query(Task).filter(Task.id == task_id).first()
-                print(f"🔍 UserInputManager DEBUG: Post-commit verification - database shows queue: {verification_task.user_input_queue}")
-            else:
-                print(f"🔍 UserInputManager DEBUG: Skipping commit (auto_commit=False)")
+                logger.info(f"Added user input to queue for task {task_id}: {user_input[:50]}...")
+                return True
 
-            # Close separate session if used
-            if use_separate_session:
-                separate_db.close()
-                print(f"🔍 UserInputManager DEBUG: Closed separate database session")
+            except Exception as e:
+                logger.error(f"Failed to add user input for task {task_id}: {e}")
+                working_db.rollback()
+                return False
 
-            logger.info(f"Added user input to queue for task {task_id}: {user_input[:50]}...")
+    @staticmethod
+    def is_recent_duplicate(db: Session, task_id: str, user_input: str, input_hash: Optional[str] = None, now: Optional[datetime] = None) -> bool:
+        """
+        Check whether the same input was queued for the task within DUPLICATE_WINDOW.
+
+        Args:
+            db: Database session
+            task_id: ID of the task
+            user_input: The user's input message
+            input_hash: _input_hash(user_input), if the caller already computed it
+            now: Current UTC time, if the caller already read the clock
+
+        Returns:
+            True if an identical input was queued recently
+        """
+        if input_hash is None:
+            input_hash = _input_hash(user_input)
+        if UserInputManager._recently_remembered(task_id, input_hash):
             return True
 
-        except Exception as e:
-            logger.error(f"Failed to add user input for task {task_id}: {e}")
-            working_db.rollback()
-            if use_separate_session:
-                separate_db.close()
-            return False
+        recent_cutoff = (now or datetime.utcnow()) - DUPLICATE_WINDOW
+        # The hash narrows the lookup to the index; the text comparison only
+        # runs on the (at most few) rows that match it
+        return db.query(
+            exists().where(
+                UserInput.task_id == task_id,
+                UserInput.input_hash == input_hash,
+                UserInput.created_at > recent_cutoff,
+                UserInput.input == user_input,
+            )
+        ).scalar()
+
+    @staticmethod
+    def _next_pending_entry(db: Session, task_id: str, with_images: bool = False) -> Optional[UserInput]:
+        """Return the oldest input of a task that has not been sent yet."""
+        query = db.query(UserInput)
+        if with_images:
+            # Load the deferred images column in the same SELECT
+            query = query.options(undefer(UserInput.images))
+        return query.filter(
+            UserInput.task_id == task_id,
+            UserInput.status == "pending",
+        ).order_by(UserInput.created_at).first()
 
     @staticmethod
     def has_pending_input(db: Session, task_id: str) -> bool:
@@ -149,11 +274,10 @@ class UserInputManager:
         Returns:
             True if there's pending input, False otherwise
         """
-        task = db.query(Task).filter(Task.id == task_id).first()
-        if not task:
-            return False
-
-        return task.user_input_pending and task.user_input_queue
+        # Answered from ix_user_inputs_task_status_created without touching the task row
+        return db.query(
+            exists().where(UserInput.task_id == task_id, UserInput.status == "pending")
+        ).scalar()
 
     @staticmethod
     def get_next_pending_user_input(db: Session, task_id: str) -> Optional[str]:
@@ -169,22 +293,9 @@ class UserInputManager:
             The next pending user input message, or None if no pending input
         """
         try:
-            task = db.query(Task).filter(Task.id == task_id).first()
-            if not task or not task.user_input_queue:
-                return None
-
-            # Get current queue
-            current_queue = task.user_input_queue or []
-
-            # Find first pending input (status="pending", not "sent" or "processed")
-            for entry in current_queue:
-                status = entry.get("status", "pending")  # Default to pending for backward compatibility
-                if status == "pending":
-                    print(f"📤 Found pending message: {entry['input'][:50]}...")
-                    return entry["input"]
-
-            print(f"📤 No pending messages found for task {task_id}")
-            return None
+            # Images are not needed here, so their column is not loaded
+            entry = UserInputManager._next_pending_entry(db, task_id)
+            return entry.input if entry else None
 
         except Exception as e:
             logger.error(f"Failed to get pending user input for task {task_id}: {e}")
@@ -204,73 +315,99 @@ class UserInputManager:
             Tuple of (user_input_text, images_list) or (None, None) if no pending input
         """
         try:
-            task = db.query(Task).filter(Task.id == task_id).first()
-            if not task or not task.user_input_queue:
-                return None, None
-
-            # Get current queue
-            current_queue = task.user_input_queue or []
-
-            # Find first pending input (status="pending", not "sent" or "processed")
-            for entry in current_queue:
-                status = entry.get("status", "pending")  # Default to pending for backward compatibility
-                if status == "pending":
-                    user_input = entry["input"]
-                    images = entry.get("images")  # May be None or list of image dicts
+            entry = UserInputManager._next_pending_entry(db, task_id, with_images=True)
+            if entry:
+                images = entry.images  # May be None or list of image dicts
+                image_count = len(images) if images else 0
+                logger.debug("Task %s: Found pending message with %d images: %.50s...", task_id, image_count, entry.input)
+                return entry.input, images
+
+            logger.debug("Task %s: No pending messages found", task_id)
+            return None, None
+
+        except Exception as e:
+            logger.error(f"Failed to get pending user input with images for task {task_id}: {e}")
+            return None, None
+
+    @staticmethod
+    def pop_next_pending_user_input(db: Session, task_id: str) -> Tuple[Optional[str], Optional[List[Dict[str, str]]]]:
+        """
+        Claim the next PENDING user input: return it and mark it as 'sent'.
+
+        Equivalent to get_next_pending_user_input_with_images() followed by
+        mark_message_as_sent(), but marks the exact entry that was returned.
+
+        Args:
+            db: Database session
+            task_id: ID of the task
+
+        Returns:
+            Tuple of (user_input_text, images_list) or (None, None) if no pending input
+        """
+        try:
+            for _ in range(_CLAIM_ATTEMPTS):
+                entry = UserInputManager._next_pending_entry(db, task_id, with_images=True)
+                if not entry:
+                    return None, None
+
+                user_input = entry.input
+                images = entry.images
+                # Only claim the entry if it is still pending; another executor or the
+                # immediate-processing path may have sent it since it was read
+                claimed = db.execute(
+                    update(UserInput)
+                    .where(UserInput.id == entry.id, UserInput.status == "pending")
+                    .values(status="sent", sent_at=datetime.utcnow())
+                ).rowcount
+                db.commit()
+
+                if claimed:
                     image_count = len(images) if images else 0
-                    print(f"📤 Found pending message with {image_count} images: {user_input[:50]}...")
+                    logger.debug("Task %s: Claimed pending message with %d images: %.50s...", task_id, image_count, user_input)
                     return user_input, images
 
-            print(f"📤 No pending messages found for task {task_id}")
+                logger.debug("Task %s: Pending message %s was claimed concurrently, retrying", task_id, entry.id)
+
+            logger.warning("Task %s: Could not claim a pending message after %d attempts", task_id, _CLAIM_ATTEMPTS)
             return None, None
 
         except Exception as e:
-            logger.error(f"Failed to get pending user input with images for task {task_id}: {e}")
+            logger.error(f"Failed to claim pending user input for task {task_id}: {e}")
+            db.rollback()
             return None, None
 
     @staticmethod
-    def mark_message_as_sent(db: Session, task_id: str, user_input: str) -> bool:
+    def mark_message_as_sent(db: Session, task_id: str, user_input: Optional[str] = None, entry_id: Optional[str] = None) -> bool:
         """
         Mark a specific message as 'sent' to prevent duplicate processing.
 
         Args:
             db: Database session
             task_id: ID of the task
-            user_input: The message that was sent
+            user_input: The message that was sent; every pending entry with this text is marked
+            entry_id: ID of the queue entry that was sent; takes precedence over user_input
 
         Returns:
             True if message was found and marked as sent
         """
         try:
-            task = db.query(Task).filter(Task.id == task_id).first()
-            if not task or not task.user_input_queue:
-                return False
+            if entry_id is not None:
+                match = (UserInput.id == entry_id,)
+            else:
+                match = (UserInput.input_hash == _input_hash(user_input), UserInput.input == user_input)
 
-            # Get current queue
-            current_queue = task.user_input_queue or []
-            updated_queue = []
-            message_found = False
-
-            for entry in current_queue:
-                if entry["input"] == user_input and entry.get("status", "pending") == "pending":
-                    # Mark this message as sent
-                    entry["status"] = "sent"
-                    entry["sent_at"] = datetime.utcnow().isoformat()
-                    message_found = True
-                    print(f"📤 Marked message as SENT: {user_input[:50]}...")
-
-                updated_queue.append(entry)
-
-            if message_found:
-                # Update the queue
-                task.user_input_queue = updated_queue
-                from sqlalchemy.orm.attributes import flag_modified
-                flag_modified(task, 'user_input_queue')
+            result = db.execute(
+                update(UserInput)
+                .where(UserInput.task_id == task_id, UserInput.status == "pending", *match)
+                .values(status="sent", sent_at=datetime.utcnow())
+            )
+
+            if result.rowcount:
                 db.commit()
-                print(f"✅ Successfully marked message as sent for task {task_id}")
+                logger.debug("Task %s: Marked message as sent: %.50s...", task_id, entry_id or user_input)
                 return True
             else:
-                print(f"⚠️ Message not found in pending queue for task {task_id}")
+                logger.debug("Task %s: Message not found in pending queue", task_id)
                 return False
 
         except Exception as e:
@@ -282,7 +419,7 @@ class UserInputManager:
     def get_next_user_input(db: Session, task_id: str) -> Optional[str]:
         """
         Get the next user input from the queue and mark it as processed.
-        DEPRECATED: Use get_next_pending_user_input() + mark_message_as_sent() instead.
+        DEPRECATED: Use pop_next_pending_user_input() instead.
 
         Args:
             db: Database session
@@ -292,42 +429,21 @@ class UserInputManager:
             The next user input message, or None if no input pending
         """
         try:
-            task = db.query(Task).filter(Task.id == task_id).first()
-            if not task or not task.user_input_queue:
-                return None
-
-            # Get current queue
-            current_queue = task.user_input_queue or []
-
             # Find first unprocessed input
-            next_input = None
-            updated_queue = []
-
-            for entry in current_queue:
-                if not entry.get("processed", False) and next_input is None:
-                    # This is our next input
-                    next_input = entry["input"]
-                    entry["processed"] = True
-                    entry["processed_at"] = datetime.utcnow().isoformat()
-
-                updated_queue.append(entry)
-
-            if next_input:
-                # Update the queue
-                task.user_input_queue = updated_queue
-
-                # Check if there are more unprocessed inputs
-                has_more_pending = any(
-                    not entry.get("processed", False)
-                    for entry in updated_queue
-                )
-                task.user_input_pending = has_more_pending
+            entry = db.query(UserInput).filter(
+                UserInput.task_id == task_id,
+                UserInput.processed == False,  # noqa: E712
+            ).order_by(UserInput.created_at).first()
+            if not entry:
+                return None
 
-                db.commit()
-                logger.info(f"Retrieved user input for task {task_id}: {next_input[:50]}...")
-                return next_input
+            entry.processed = True
+            entry.processed_at = datetime.utcnow()
 
-            return None
+            next_input = entry.input
+            db.commit()
+            logger.info(f"Retrieved user input for task {task_id}: {next_input[:50]}...")
+            return next_input
 
         except Exception as e:
             logger.error(f"Failed to get user input for task {task_id}: {e}")
@@ -347,23 +463,12 @@ class UserInputManager:
             Number of inputs cleared
         """
         try:
-            task = db.query(Task).filter(Task.id == task_id).first()
-            if not task or not task.user_input_queue:
-                return 0
-
-            current_queue = task.user_input_queue or []
-
-            # Keep only unprocessed inputs
-            unprocessed_queue = [
-                entry for entry in current_queue
-                if not entry.get("processed", False)
-            ]
-
-            cleared_count = len(current_queue) - len(unprocessed_queue)
+            cleared_count = db.query(UserInput).filter(
+                UserInput.task_id == task_id,
+                UserInput.processed == True,  # noqa: E712
+            ).delete(synchronize_session=False)
 
             if cleared_count > 0:
-                task.user_input_queue = unprocessed_queue
-                task.user_input_pending = len(unprocessed_queue) > 0
                 db.commit()
                 logger.info(f"Cleared {cleared_count} processed inputs for task {task_id}")
 
@@ -422,15 +527,13 @@ class UserInputManager:
             from app.models import Task, TaskStatus
             import os
 
-            # Get the task
-            task = db.query(Task).filter(Task.id == task_id).first()
+            # Get the task, overwriting any copy already in the session so the
+            # latest claude_session_id is used (one SELECT instead of get + refresh)
+            task = db.get(Task, task_id, populate_existing=True)
             if not task:
                 logger.error(f"Task {task_id} not found for immediate processing")
                 return False
 
-            # Refresh task to get latest claude_session_id from database
-            db.refresh(task)
-
             # Only process if task is actively running
             if task.status != TaskStatus.RUNNING:
                 logger.info(f"Task {task_id} not running (status: {task.status}) - skipping immediate processing")
@@ -451,18 +554,39 @@ class UserInputManager:
 
             # Send the user message to Claude with session continuity
             claude_session_id = task.claude_session_id
-            print(f"🔍 IMMEDIATE PROCESSING DEBUG: task_id={task_id}, claude_session_id={claude_session_id}")
 
             # If no session ID yet, don't use session continuity (let Claude create new session)
             # This happens when immediate processing runs before task executor sets claude_session_id
             if not claude_session_id:
-                print(f"⚠️  No claude_session_id available yet for task {task_id}, proceeding without session continuity")
+                logger.info("Task %s: No claude_session_id available yet, proceeding without session continuity", task_id)
                 claude_session_id = None  # Explicitly set to None for new session
-            else:
-                print(f"✅ Using existing claude_session_id: {claude_session_id} for task {task_id}")
 
             logger.info(f"Immediate processing using claude_session_id: {claude_session_id} for task {task_id}")
 
+            # Database writes for this send run in order on one worker thread,
+            # so the shared background loop never waits on the database
+            db_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="user-input-writer")
+
+            def save_immediate_response(content: str, usage: dict):
+                """Save Claude's immediate response. Runs on db_writer."""
+                try:
+                    interaction = ClaudeInteraction(
+                        task_id=task_id,
+                        interaction_type=InteractionType.CLAUDE_RESPONSE,
+                        content=content
+                    )
+                    db.add(interaction)
+
+                    # Update task tokens if available
+                    if usage:
+                        task.total_tokens_used += usage.get('output_tokens', 0)
+
+                    db.commit()
+                    logger.info(f"Saved immediate Claude response for task {task_id}")
+                except Exception as e:
+                    db.rollback()
+                    logger.error("Task %s: Failed to save immediate Claude response: %s", task_id, e)
+
             def handle_immediate_response(event: dict):
                 """Handle Claude's immediate response to user input."""
                 event_type = event.get('type')
@@ -470,103 +594,56 @@ class UserInputManager:
                 if event_type == 'message':
                     content = event.get('content', '')
                     if content.strip():
-                        # Save Claude's immediate response
-                        from app.models.interaction import ClaudeInteraction, InteractionType
-                        interaction = ClaudeInteraction(
-                            task_id=task_id,
-                            interaction_type=InteractionType.CLAUDE_RESPONSE,
-                            content=content
-                        )
-                        db.add(interaction)
-
-                        # Update task tokens if available
-                        usage = event.get('usage', {})
-                        if usage:
-                            input_tokens = usage.get('input_tokens', 0)
-                            output_tokens = usage.get('output_tokens', 0)
-                            task.total_tokens_used += output_tokens
-
-                        db.commit()
-                        logger.info(f"Saved immediate Claude response for task {task_id}")
-
-            # Send message immediately with session continuity
-            # Use background thread to avoid blocking the API response
-            import threading
-
-            def send_message_background():
+                        db_writer.submit(save_immediate_response, content, event.get('usage', {}))
+
+            # CRITICAL: Reset the flag once processing has finished so that the
+            # task executor doesn't skip processing when it restarts
+            def reset_flag_after_processing():
                 try:
-                    import asyncio
-
-                    async def send_immediate():
-                        await streaming_client.send_message_streaming(
-                            message=user_input,
-                            event_callback=handle_immediate_response,
-                            session_id=claude_session_id
-                        )
-
-                    # Create new event loop for background thread
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-                    try:
-                        loop.run_until_complete(send_immediate())
-                    finally:
-                        loop.close()
+                    from app.database import SessionLocal
+                    with SessionLocal() as reset_db:
+                        reset_task = reset_db.get(Task, task_id)
+                        if reset_task and reset_task.immediate_processing_active:
+                            reset_task.immediate_processing_active = False
+                            reset_db.commit()
+                            logger.debug("Task %s: Auto-reset immediate_processing_active=False after processing", task_id)
+                except Exception as e:
+                    logger.error("Task %s: Failed to reset immediate_processing_active: %s", task_id, e)
 
+            async def send_immediate():
+                try:
+                    await streaming_client.send_message_streaming(
+                        message=user_input,
+                        event_callback=handle_immediate_response,
+                        session_id=claude_session_id
+                    )
                 except Exception as e:
                     error_str = str(e)
                     logger.error(f"Background message sending failed: {e}")
 
                     # If session ID is invalid (process terminated), try without session continuity
                     if "No conversation found with session ID" in error_str and claude_session_id:
-                        print(f"🔄 Session {claude_session_id} invalid, retrying without session continuity")
+                        logger.warning("Task %s: Session %s invalid, retrying without session continuity", task_id, claude_session_id)
                         try:
-                            async def retry_without_session():
-                                await streaming_client.send_message_streaming(
-                                    message=user_input,
-                                    event_callback=handle_immediate_response,
-                                    session_id=None  # Start new session
-                                )
-
-                            # Retry in new event loop
-                            loop = asyncio.new_event_loop()
-                            asyncio.set_event_loop(loop)
-                            try:
-                                loop.run_until_complete(retry_without_session())
-                                print(f"✅ Retry without session succeeded for task {task_id}")
-                            finally:
-                                loop.close()
+                            await streaming_client.send_message_streaming(
+                                message=user_input,
+                                event_callback=handle_immediate_response,
+                                session_id=None  # Start new session
+                            )
+                            logger.info("Task %s: Retry without session succeeded", task_id)
                         except Exception as retry_error:
                             logger.error(f"Retry without session also failed: {retry_error}")
+                finally:
+                    # Let the queued response writes finish before clearing the flag
+                    loop = asyncio.get_running_loop()
+                    await loop.run_in_executor(None, db_writer.shutdown)
+                    await loop.run_in_executor(None, reset_flag_after_processing)
 
-            # Start background processing
-            thread = threading.Thread(target=send_message_background, daemon=True)
-            thread.start()
+            # Send message on the shared background loop to avoid blocking the API response
+            asyncio.run_coroutine_threadsafe(send_immediate(), _get_background_loop())
 
             logger.info(f"Triggered immediate processing for task {task_id}: {user_input[:50]}...")
 
-            # CRITICAL: After starting immediate processing, schedule flag reset
-            # so that task executor doesn't skip processing when it restarts
-            def reset_flag_after_processing():
-                import time
-                time.sleep(3)  # Give immediate processing time to complete
-                try:
-                    from app.database import SessionLocal
-                    reset_db = SessionLocal()
-                    try:
-                        reset_task = reset_db.query(Task).filter(Task.id == task_id).first()
-                        if reset_task and reset_task.immediate_processing_active:
-                            reset_task.immediate_processing_active = False
-                            reset_db.commit()
-                            print(f"🔄 Auto-reset immediate_processing_active=False for task {task_id} after processing")
-                    finally:
-                        reset_db.close()
-                except Exception as e:
-                    print(f"❌ Failed to reset immediate_processing_active for task {task_id}: {e}")
-
-            # Start reset thread
-            reset_thread = threading.Thread(target=reset_flag_after_processing, daemon=True)
-            reset_thread.start()
-
             return True
 
         except Exception as e:
@@ -585,24 +662,36 @@ class UserInputManager:
         Returns:
             Dictionary with queue status information
         """
-        task = db.query(Task).filter(Task.id == task_id).first()
+        task = db.get(Task, task_id)
         if not task:
             return {"error": "Task not found"}
 
-        queue = task.user_input_queue or []
+        counts = dict(
+            db.query(UserInput.processed, func.count())
+            .filter(UserInput.task_id == task_id)
+            .group_by(UserInput.processed)
+            .all()
+        )
+        processed_inputs = counts.get(True, 0)
+        pending_inputs = counts.get(False, 0)
+
+        # Show last 5 entries, oldest first
+        recent = db.query(UserInput).filter(
+            UserInput.task_id == task_id
+        ).order_by(UserInput.created_at.desc()).limit(5).all()
 
         return {
-            "total_inputs": len(queue),
-            "pending_inputs": len([e for e in queue if not e.get("processed", False)]),
-            "processed_inputs": len([e for e in queue if e.get("processed", False)]),
-            "has_pending": task.user_input_pending,
+            "total_inputs": pending_inputs + processed_inputs,
+            "pending_inputs": pending_inputs,
+            "processed_inputs": processed_inputs,
+            "has_pending": UserInputManager.has_pending_input(db, task_id),
             "queue_preview": [
                 {
-                    "id": entry["id"],
-                    "input_preview": entry["input"][:50] + "..." if len(entry["input"]) > 50 else entry["input"],
-                    "timestamp": entry["timestamp"],
-                    "processed": entry.get("processed", False)
+                    "id": entry.id,
+                    "input_preview": entry.input[:50] + "..." if len(entry.input) > 50 else entry.input,
+                    "timestamp": entry.created_at.isoformat(),
+                    "processed": entry.processed
                 }
-                for entry in queue[-5:]  # Show last 5 entries
+                for entry in reversed(recent)
             ]
-        }
\ No newline at end of file
+        }
@@ -2,116 +2,125 @@
 Utilities for formatting conversation data consistently across API endpoints.
 """
 
-def collapse_consecutive_tool_results(interactions_list, collapse_tools=True):
+import re
+from dataclasses import dataclass, field
+
+# A claude_response counts as a tool use message if it mentions "tool use:" anywhere,
+# or starts with "I'll" and mentions "tool" (case-insensitive, ignoring leading whitespace)
+_TOOL_USE_RE = re.compile(r"tool use:|\A\s*i'll.*tool", re.IGNORECASE | re.DOTALL)
+
+
+def _is_tool_use_message(content):
+    """Check if a claude_response is just a tool use message."""
+    return bool(content) and _TOOL_USE_RE.search(content) is not None
+
+
+@dataclass
+class _ToolGroup:
+    """A tool group being collected; turned into its output dict once complete."""
+
+    id: str
+    first_timestamp: str
+    last_timestamp: str
+    tools: list = field(default_factory=list)
+
+    def to_dict(self):
+        tool_count = len(self.tools)
+        return {
+            "id": self.id,
+            "type": "tool_group",
+            "tool_count": tool_count,
+            "first_timestamp": self.first_timestamp,
+            "last_timestamp": self.last_timestamp,
+            "summary": f"Tool execution results ({tool_count} tools)",
+            "tools": self.tools
+        }
+
+
+def iter_collapsed_tool_results(interactions_list, collapse_tools=True):
     """
-    Collapse consecutive tool operations (claude_response + tool_result) into groups.
+    Yield formatted interactions, collapsing consecutive tool operations
+    (claude_response + tool_result) into groups.
+
+    Entries are produced one at a time, so callers that stream them don't
+    need the whole formatted conversation in memory.
 
     Args:
         interactions_list: List of interaction objects with id, interaction_type, content, created_at
         collapse_tools: Whether to collapse tool groups (default True)
 
-    Returns:
-        List of formatted interaction/tool_group objects
+    Yields:
+        Formatted interaction/tool_group objects
     """
     if not collapse_tools:
-        return [
-            {
-                "id": interaction.id,
-                "type": interaction.interaction_type.value,
-                "content": interaction.content,
-                "timestamp": interaction.created_at.isoformat(),
-                "images": interaction.images if hasattr(interaction, 'images') and interaction.images else None
-            }
-            for interaction in interactions_list
-            if interaction.content and interaction.content.strip()  # Filter out empty content
-        ]
-
-    collapsed = []
-    current_tool_group = None
-    i = 0
-
-    def is_tool_use_message(content):
-        """Check if a claude_response is just a tool use message."""
-        if not content:
-            return False
-        content_lower = content.lower().strip()
-        return (content_lower.startswith("[tool use:") or
-                "tool use:" in content_lower or
-                content_lower == "[tool use: 1 tools]" or
-                content_lower.startswith("i'll") and "tool" in content_lower)
-
-    while i < len(interactions_list):
-        interaction = interactions_list[i]
-
-        # Check if this starts a tool operation sequence
-        if (interaction.interaction_type.value == "claude_response" and
-            is_tool_use_message(interaction.content)):
-
-            # This is a tool use message, start collecting the sequence
-            if current_tool_group is None:
-                current_tool_group = {
-                    "id": f"tool_group_{interaction.id}",
-                    "type": "tool_group",
-                    "tool_count": 0,
-                    "first_timestamp": interaction.created_at.isoformat(),
-                    "last_timestamp": interaction.created_at.isoformat(),
-                    "summary": "",
-                    "tools": []
+        for interaction in interactions_list:
+            # Read content once; on ORM rows every attribute access goes through a descriptor
+            content = interaction.content
+            if content and not content.isspace():  # Filter out empty content
+                yield {
+                    "id": interaction.id,
+                    "type": interaction.interaction_type.value,
+                    "content": content,
+                    "timestamp": interaction.created_at.isoformat(),
+                    "images": getattr(interaction, 'images', None) or None
                 }
+        return
+
+    current_tool_group = None
+
+    for interaction in interactions_list:
+        # Read each attribute once; on ORM rows every access goes through a descriptor
+        interaction_id = interaction.id
+        interaction_type = interaction.interaction_type.value
+        content = interaction.content
+        timestamp = interaction.created_at.isoformat()
 
-            # Collect all following tool_results
-            i += 1
-            while i < len(interactions_list) and interactions_list[i].interaction_type.value == "tool_result":
-                tool_result = interactions_list[i]
-                current_tool_group["tool_count"] += 1
-                current_tool_group["last_timestamp"] = tool_result.created_at.isoformat()
-                current_tool_group["tools"].append({
-                    "id": tool_result.id,
-                    "type": tool_result.interaction_type.value,
-                    "content": tool_result.content,
-                    "timestamp": tool_result.created_at.isoformat()
-                })
-                i += 1
-
-            # Update summary
-            current_tool_group["summary"] = f"Tool execution results ({current_tool_group['tool_count']} tools)"
-
-            # Don't increment i here since we already moved past the tool_results
-            continue
-
-        elif interaction.interaction_type.value == "tool_result" and current_tool_group is not None:
-            # Standalone tool_result that should be added to current group
-            current_tool_group["tool_count"] += 1
-            current_tool_group["last_timestamp"] = interaction.created_at.isoformat()
-            current_tool_group["summary"] = f"Tool execution results ({current_tool_group['tool_count']} tools)"
-            current_tool_group["tools"].append({
-                "id": interaction.id,
-                "type": interaction.interaction_type.value,
-                "content": interaction.content,
-                "timestamp": interaction.created_at.isoformat()
+        if interaction_type == "claude_response" and _is_tool_use_message(content):
+            # A tool use message starts a group (or continues the open one);
+            # the tool_results that follow are collected into it
+            if current_tool_group is None:
+                current_tool_group = _ToolGroup(f"tool_group_{interaction_id}", timestamp, timestamp)
+
+        elif interaction_type == "tool_result" and current_tool_group is not None:
+            current_tool_group.last_timestamp = timestamp
+            current_tool_group.tools.append({
+                "id": interaction_id,
+                "type": interaction_type,
+                "content": content,
+                "timestamp": timestamp
             })
         else:
             # Non-tool interaction or meaningful claude_response
             # Finalize any current tool group
             if current_tool_group is not None:
-                collapsed.append(current_tool_group)
+                yield current_tool_group.to_dict()
                 current_tool_group = None
 
             # Add the meaningful interaction (skip empty/simulated human if needed)
-            if not (interaction.interaction_type.value == "simulated_human" and
-                   (not interaction.content or interaction.content.strip() == "")):
-                collapsed.append({
-                    "id": interaction.id,
-                    "type": interaction.interaction_type.value,
-                    "content": interaction.content,
-                    "timestamp": interaction.created_at.isoformat(),
-                    "images": interaction.images if hasattr(interaction, 'images') and interaction.images else None
-                })
-
-        i += 1
+            if not (interaction_type == "simulated_human" and
+                   (not content or content.isspace())):
+                yield {
+                    "id": interaction_id,
+                    "type": interaction_type,
+                    "content": content,
+                    "timestamp": timestamp,
+                    "images": getattr(interaction, 'images', None) or None
+                }
 
     # Don't forget to add the last tool group if it exists
     if current_tool_group is not None:
-        collapsed.append(current_tool_group)
+        yield current_tool_group.to_dict()
+
+
+def collapse_consecutive_tool_results(interactions_list, collapse_tools=True):
+    """
+    Collapse consecutive tool operations (claude_response + tool_result) into groups.
+
+    Args:
+        interactions_list: List of interaction objects with id, interaction_type, content, created_at
+        collapse_tools: Whether to collapse tool groups (default True)
 
-    return collapsed
\ No newline at end of file
+    Returns:
+        List of formatted interaction/tool_group objects
+    """
+    return list(iter_collapsed_tool_results(interactions_list, collapse_tools))
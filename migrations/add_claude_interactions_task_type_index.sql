@@ -0,0 +1,17 @@
+-- Add composite index for per-task interaction lookups
+-- Serves the task executor's interaction count at startup and the
+-- "latest Claude response" lookup at finalization
+
+SET @dbname = DATABASE();
+SET @tablename = "claude_interactions";
+
+SET @idx_exists = (SELECT COUNT(*) FROM INFORMATION_SCHEMA.STATISTICS
+    WHERE TABLE_SCHEMA = @dbname AND TABLE_NAME = @tablename AND INDEX_NAME = 'ix_claude_interactions_task_type_created');
+
+SET @sql = IF(@idx_exists = 0,
+    'CREATE INDEX ix_claude_interactions_task_type_created ON claude_interactions (task_id, interaction_type, created_at)',
+    'SELECT "Index ix_claude_interactions_task_type_created already exists" AS message');
+
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
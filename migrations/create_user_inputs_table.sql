@@ -0,0 +1,49 @@
+-- Migration: Move the user input queue into its own table
+-- Description: Queued user messages were stored as a JSON array in
+-- tasks.user_input_queue and rewritten in full on every change. Each message
+-- now is a row in user_inputs and is inserted/updated individually.
+-- Requires MySQL 8.0 (JSON_TABLE) for the backfill.
+
+CREATE TABLE IF NOT EXISTS user_inputs (
+    id VARCHAR(36) PRIMARY KEY,
+    task_id VARCHAR(36) NOT NULL,
+    input TEXT NOT NULL,
+    input_hash CHAR(32) NOT NULL COMMENT 'MD5 of input, for duplicate checks',
+    images JSON NULL COMMENT 'Attached images [{"base64": "...", "media_type": "image/png"}]',
+    status VARCHAR(20) NOT NULL DEFAULT 'pending' COMMENT 'pending -> sent',
+    processed BOOLEAN NOT NULL DEFAULT FALSE,
+    created_at DATETIME(6) NOT NULL,
+    sent_at DATETIME NULL,
+    processed_at DATETIME NULL,
+    INDEX ix_user_inputs_task_status_created (task_id, status, created_at),
+    INDEX ix_user_inputs_task_hash_created (task_id, input_hash, created_at),
+    CONSTRAINT fk_user_inputs_task FOREIGN KEY (task_id) REFERENCES tasks(id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Copy entries from the legacy JSON queue (safe to re-run)
+INSERT INTO user_inputs (id, task_id, input, input_hash, images, status, processed, created_at, sent_at, processed_at)
+SELECT
+    jt.id,
+    t.id,
+    jt.input,
+    MD5(jt.input),
+    jt.images,
+    COALESCE(jt.status, 'pending'),
+    COALESCE(jt.processed, FALSE),
+    CAST(REPLACE(jt.ts, 'T', ' ') AS DATETIME(6)),
+    CAST(REPLACE(jt.sent_at, 'T', ' ') AS DATETIME),
+    CAST(REPLACE(jt.processed_at, 'T', ' ') AS DATETIME)
+FROM tasks t,
+    JSON_TABLE(t.user_input_queue, '$[*]' COLUMNS (
+        id VARCHAR(36) PATH '$.id',
+        input TEXT PATH '$.input',
+        images JSON PATH '$.images',
+        status VARCHAR(20) PATH '$.status',
+        processed BOOLEAN PATH '$.processed',
+        ts VARCHAR(32) PATH '$.timestamp',
+        sent_at VARCHAR(32) PATH '$.sent_at',
+        processed_at VARCHAR(32) PATH '$.processed_at'
+    )) AS jt
+WHERE t.user_input_queue IS NOT NULL
+  AND jt.id IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM user_inputs u WHERE u.id = jt.id);
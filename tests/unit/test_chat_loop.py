@@ -0,0 +1,174 @@
+"""
+Unit tests for TaskExecutor's chat loop helpers.
+"""
+
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.models import Session, Task, TaskStatus
+from app.services import task_executor
+from app.services.task_executor import TaskExecutor
+
+
+class FakeInputManager:
+    """Records queue lookups and hands out queued inputs."""
+
+    def __init__(self, inputs=()):
+        self.inputs = list(inputs)
+        self.lookups = 0
+
+    def pop_next_pending_user_input(self, db, task_id):
+        self.lookups += 1
+        if self.inputs:
+            return self.inputs.pop(0), None
+        return None, None
+
+    get_next_pending_user_input_with_images = pop_next_pending_user_input
+
+    def has_pending_input(self, db, task_id):
+        return bool(self.inputs)
+
+    def get_input_listener(self, task_id):
+        return None
+
+
+@pytest.fixture
+def executor():
+    executor = TaskExecutor()
+    executor.user_input_manager = FakeInputManager()
+    return executor
+
+
+def test_next_pending_input_skips_query_until_signalled(executor):
+    task = SimpleNamespace(id="task-1")
+    event = asyncio.Event()
+    event.set()
+
+    async def run():
+        assert await executor._next_pending_input(None, task, event, signalled_only=True) == (None, None)
+        assert await executor._next_pending_input(None, task, event, signalled_only=True) == (None, None)
+        executor.user_input_manager.inputs.append("hello")
+        event.set()
+        assert await executor._next_pending_input(None, task, event, signalled_only=True) == ("hello", None)
+
+    asyncio.run(run())
+    # The second call found the event clear and did not query
+    assert executor.user_input_manager.lookups == 2
+
+
+def test_next_pending_input_always_queries_by_default(executor):
+    task = SimpleNamespace(id="task-1")
+    event = asyncio.Event()
+    event.set()
+
+    async def run():
+        assert await executor._next_pending_input(None, task, event) == (None, None)
+        # Queued without a signal; the check deciding whether to pause still sees it
+        executor.user_input_manager.inputs.append("from another worker")
+        return await executor._next_pending_input(None, task, event)
+
+    assert asyncio.run(run()) == ("from another worker", None)
+
+
+def test_next_pending_input_polls_without_signal(executor, monkeypatch):
+    task = SimpleNamespace(id="task-1")
+    event = asyncio.Event()
+    event.set()
+    monkeypatch.setattr(task_executor, "_INPUT_POLL_INTERVAL", 0)
+
+    async def run():
+        assert await executor._next_pending_input(None, task, event, signalled_only=True) == (None, None)
+        # Queued elsewhere, e.g. by another worker process: the event is never set
+        executor.user_input_manager.inputs.append("from another worker")
+        return await executor._next_pending_input(None, task, event, signalled_only=True)
+
+    assert asyncio.run(run()) == ("from another worker", None)
+
+
+class HangingStreamingClient:
+    """Answers the initial context message, then never returns."""
+
+    def __init__(self):
+        self.calls = 0
+        self.cancelled = False
+
+    async def send_message_streaming(self, message, project_path, **kwargs):
+        self.calls += 1
+        if self.calls == 1:
+            return "Acknowledged", 1234, "claude-session", None
+        try:
+            await asyncio.sleep(3600)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+
+@pytest.fixture
+def db():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine, expire_on_commit=False)()
+    yield db
+    db.close()
+
+
+def test_wall_clock_limit_marks_task_exhausted(executor, db, tmp_path):
+    session = Session(project_path=str(tmp_path))
+    db.add(session)
+    db.commit()
+    task = Task(
+        task_name="wall-clock",
+        session_id=session.id,
+        description="Never finishes",
+        status=TaskStatus.RUNNING,
+        end_criteria_config={"max_wall_seconds": 0.2},
+    )
+    db.add(task)
+    db.commit()
+
+    executor.streaming_client = HangingStreamingClient()
+    executor.user_input_manager.inputs.append("Implement the feature")
+    tests_run = []
+
+    async def generate_and_run_tests(*args):
+        tests_run.append(args)
+
+    executor._generate_and_run_tests = generate_and_run_tests
+
+    asyncio.run(executor._execute_with_claude(db, task, str(tmp_path)))
+
+    db.refresh(task)
+    assert task.status == TaskStatus.EXHAUSTED
+    assert task.error_message == "Wall-clock limit reached: 0.2s"
+    assert executor.streaming_client.cancelled
+    assert tests_run == []
+
+
+def test_run_db_finishes_operation_before_cancelling(executor):
+    started = threading.Event()
+    finished = []
+
+    def slow_operation():
+        started.set()
+        time.sleep(0.2)
+        finished.append(True)
+
+    async def run():
+        call = asyncio.ensure_future(executor._run_db(slow_operation))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait)
+        call.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await call
+        return bool(finished)
+
+    assert asyncio.run(run())
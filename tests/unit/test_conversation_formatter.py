@@ -0,0 +1,99 @@
+"""
+Unit tests for collapsing tool operations in conversation output.
+"""
+
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from app.models.interaction import InteractionType
+from app.utils.conversation_formatter import collapse_consecutive_tool_results
+
+_START = datetime(2024, 1, 1, 12, 0, 0)
+
+
+def _interactions(*rows):
+    """Build interaction-like objects from (type, content) pairs, one second apart."""
+    return [
+        SimpleNamespace(
+            id=index,
+            interaction_type=interaction_type,
+            content=content,
+            created_at=_START + timedelta(seconds=index),
+            images=None,
+        )
+        for index, (interaction_type, content) in enumerate(rows)
+    ]
+
+
+@pytest.mark.parametrize("content", [
+    "[Tool use: Read]",
+    "  [tool use: 1 tools]",
+    "Running TOOL USE: bash",
+    "I'll use the Read tool",
+    "\n i'll call a TOOL",
+])
+def test_tool_use_messages_start_a_group(content):
+    result = collapse_consecutive_tool_results(_interactions(
+        (InteractionType.CLAUDE_RESPONSE, content),
+        (InteractionType.TOOL_RESULT, "ok"),
+    ))
+    assert [entry["type"] for entry in result] == ["tool_group"]
+
+
+@pytest.mark.parametrize("content", ["Done.", "I'll fix it now", "tool use", ""])
+def test_other_responses_are_not_grouped(content):
+    result = collapse_consecutive_tool_results(_interactions(
+        (InteractionType.CLAUDE_RESPONSE, content),
+    ))
+    assert [entry["type"] for entry in result] == ["claude_response"]
+
+
+def test_consecutive_tool_operations_collapse_into_one_group():
+    result = collapse_consecutive_tool_results(_interactions(
+        (InteractionType.USER_REQUEST, "Fix the bug"),
+        (InteractionType.CLAUDE_RESPONSE, "[Tool use: Read]"),
+        (InteractionType.TOOL_RESULT, "file contents"),
+        (InteractionType.CLAUDE_RESPONSE, "[Tool use: Edit]"),
+        (InteractionType.TOOL_RESULT, "edited"),
+        (InteractionType.TOOL_RESULT, "tests pass"),
+        (InteractionType.CLAUDE_RESPONSE, "Fixed."),
+        (InteractionType.SIMULATED_HUMAN, "  "),
+    ))
+
+    assert [entry["type"] for entry in result] == ["user_request", "tool_group", "claude_response"]
+    group = result[1]
+    assert group["id"] == "tool_group_1"
+    assert group["tool_count"] == 3
+    assert group["summary"] == "Tool execution results (3 tools)"
+    assert group["first_timestamp"] == (_START + timedelta(seconds=1)).isoformat()
+    assert group["last_timestamp"] == (_START + timedelta(seconds=5)).isoformat()
+    assert [tool["content"] for tool in group["tools"]] == ["file contents", "edited", "tests pass"]
+
+
+def test_tool_result_without_group_is_kept_as_is():
+    result = collapse_consecutive_tool_results(_interactions(
+        (InteractionType.TOOL_RESULT, "orphan"),
+    ))
+    assert result == [{
+        "id": 0,
+        "type": "tool_result",
+        "content": "orphan",
+        "timestamp": _START.isoformat(),
+        "images": None,
+    }]
+
+
+def test_without_collapsing_only_empty_contents_are_dropped():
+    interactions = _interactions(
+        (InteractionType.CLAUDE_RESPONSE, "[Tool use: Read]"),
+        (InteractionType.TOOL_RESULT, " \n"),
+        (InteractionType.TOOL_RESULT, None),
+        (InteractionType.USER_REQUEST, "Thanks"),
+    )
+    interactions[3].images = [{"base64": "iVBORw0KGgo=", "media_type": "image/png"}]
+
+    result = collapse_consecutive_tool_results(interactions, collapse_tools=False)
+    assert [entry["id"] for entry in result] == [0, 3]
+    assert result[1]["images"] == interactions[3].images
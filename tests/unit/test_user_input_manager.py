@@ -0,0 +1,149 @@
+"""
+Unit tests for the UserInputManager queue against an in-memory database.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.models import Session, Task, UserInput
+from app.services.user_input_manager import DUPLICATE_WINDOW, UserInputManager
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+@pytest.fixture
+def db(engine):
+    db = sessionmaker(bind=engine, expire_on_commit=False)()
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def task(db, tmp_path):
+    session = Session(project_path=str(tmp_path))
+    db.add(session)
+    db.commit()
+    task = Task(task_name="queue", session_id=session.id, description="Queue test")
+    db.add(task)
+    db.commit()
+    yield task
+    UserInputManager.forget_recent_inputs(task.id)
+
+
+def test_add_user_input_queues_entry(db, task):
+    images = [{"base64": "aGVsbG8=", "media_type": "image/png"}]
+    assert UserInputManager.add_user_input(db, task.id, "Add a login page", images=images)
+
+    entry = db.query(UserInput).filter(UserInput.task_id == task.id).one()
+    assert entry.input == "Add a login page"
+    assert entry.status == "pending"
+    assert entry.images == images
+
+
+def test_add_user_input_rejects_unknown_task(db):
+    assert not UserInputManager.add_user_input(db, "missing-task", "hello")
+
+
+def test_duplicate_blocked_within_window(db, task):
+    assert UserInputManager.add_user_input(db, task.id, "Run the tests")
+    assert not UserInputManager.add_user_input(db, task.id, "Run the tests")
+    assert UserInputManager.add_user_input(db, task.id, "Run the linter")
+
+    # Without the in-process history the database lookup still finds it
+    UserInputManager.forget_recent_inputs(task.id)
+    assert UserInputManager.is_recent_duplicate(db, task.id, "Run the tests")
+    assert not UserInputManager.add_user_input(db, task.id, "Run the tests")
+    assert db.query(UserInput).filter(UserInput.task_id == task.id).count() == 2
+
+
+def test_duplicate_allowed_after_window(db, task):
+    assert UserInputManager.add_user_input(db, task.id, "Run the tests")
+    entry = db.query(UserInput).filter(UserInput.task_id == task.id).one()
+    entry.created_at = datetime.utcnow() - DUPLICATE_WINDOW - timedelta(seconds=1)
+    db.commit()
+    UserInputManager.forget_recent_inputs(task.id)
+
+    assert not UserInputManager.is_recent_duplicate(db, task.id, "Run the tests")
+    assert UserInputManager.add_user_input(db, task.id, "Run the tests")
+
+
+def test_pop_claims_inputs_in_order(db, task):
+    images = [{"base64": "aGVsbG8=", "media_type": "image/png"}]
+    UserInputManager.add_user_input(db, task.id, "first", images=images)
+    UserInputManager.add_user_input(db, task.id, "second")
+
+    assert UserInputManager.pop_next_pending_user_input(db, task.id) == ("first", images)
+    assert UserInputManager.pop_next_pending_user_input(db, task.id) == ("second", None)
+    assert UserInputManager.pop_next_pending_user_input(db, task.id) == (None, None)
+    statuses = {entry.status for entry in db.query(UserInput).filter(UserInput.task_id == task.id)}
+    assert statuses == {"sent"}
+
+
+def test_pop_retries_when_entry_claimed_concurrently(db, engine, task, monkeypatch):
+    UserInputManager.add_user_input(db, task.id, "first")
+    UserInputManager.add_user_input(db, task.id, "second")
+
+    next_pending_entry = UserInputManager._next_pending_entry
+    reads = []
+
+    def racing_next_pending_entry(db, task_id, with_images=False):
+        entry = next_pending_entry(db, task_id, with_images=with_images)
+        reads.append(entry.input)
+        if len(reads) == 1:
+            # Another executor sends the entry between the read and the claim
+            other_db = sessionmaker(bind=engine)()
+            assert UserInputManager.mark_message_as_sent(other_db, task_id, entry_id=entry.id)
+            other_db.close()
+        return entry
+
+    monkeypatch.setattr(UserInputManager, "_next_pending_entry", staticmethod(racing_next_pending_entry))
+
+    assert UserInputManager.pop_next_pending_user_input(db, task.id) == ("second", None)
+    assert reads == ["first", "second"]
+
+
+def test_mark_message_as_sent(db, task):
+    UserInputManager.add_user_input(db, task.id, "by text")
+    UserInputManager.add_user_input(db, task.id, "by id")
+    entry_id = db.query(UserInput.id).filter(UserInput.input == "by id").scalar()
+
+    assert UserInputManager.mark_message_as_sent(db, task.id, "by text")
+    assert UserInputManager.mark_message_as_sent(db, task.id, entry_id=entry_id)
+    # Already sent
+    assert not UserInputManager.mark_message_as_sent(db, task.id, "by text")
+    assert UserInputManager.get_next_pending_user_input(db, task.id) is None
+
+
+def test_has_pending_input(db, task):
+    assert not UserInputManager.has_pending_input(db, task.id)
+    UserInputManager.add_user_input(db, task.id, "hello")
+    assert UserInputManager.has_pending_input(db, task.id)
+    UserInputManager.pop_next_pending_user_input(db, task.id)
+    assert not UserInputManager.has_pending_input(db, task.id)
+
+
+def test_get_queue_status(db, task):
+    assert UserInputManager.get_queue_status(db, "missing-task") == {"error": "Task not found"}
+
+    long_input = "x" * 60
+    UserInputManager.add_user_input(db, task.id, "first")
+    UserInputManager.add_user_input(db, task.id, long_input)
+
+    status = UserInputManager.get_queue_status(db, task.id)
+    assert status["total_inputs"] == 2
+    assert status["pending_inputs"] == 2
+    assert status["processed_inputs"] == 0
+    assert status["has_pending"] is True
+    assert [entry["input_preview"] for entry in status["queue_preview"]] == ["first", "x" * 50 + "..."]
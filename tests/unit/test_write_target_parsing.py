@@ -0,0 +1,53 @@
+"""
+Unit tests for parsing the planning phase's write_targets block.
+"""
+
+import pytest
+
+from app.services.task_executor import TaskExecutor
+
+
+@pytest.fixture
+def executor():
+    return TaskExecutor()
+
+
+@pytest.fixture
+def modules():
+    return [
+        {"path": "/repos/service", "module_name": "service"},
+        {"path": "/repos/sdk", "module_name": "sdk"},
+        {"path": "/repos/idl", "module_name": "idl"},
+    ]
+
+
+def test_parse_numbers(executor, modules):
+    response = "Plan:\n```write_targets\n1\n[3]\n2.\n1\n```\nReasoning..."
+    assert executor._parse_write_targets(response, modules) == [
+        "/repos/service",
+        "/repos/idl",
+        "/repos/sdk",
+    ]
+
+
+def test_parse_none_and_missing_block(executor, modules):
+    assert executor._parse_write_targets("```write_targets\nNONE\n```", modules) == []
+    assert executor._parse_write_targets("No planning block here", modules) == []
+
+
+def test_parse_out_of_range_numbers_ignored(executor, modules):
+    assert executor._parse_write_targets("```write_targets\n0\n4\n2\n```", modules) == ["/repos/sdk"]
+
+
+def test_parse_paths_fallback(executor, modules):
+    response = "```WRITE_TARGETS\n# comment\n/repos/idl\nsdk\nunknown\n```"
+    assert executor._parse_write_targets(response, modules) == ["/repos/idl", "/repos/sdk"]
+
+
+def test_parse_paths_fallback_multi_component_suffix(executor):
+    modules = [
+        {"path": "/a/service/api"},
+        {"path": "/b/gateway/api"},
+    ]
+    response = "```write_targets\ngateway/api\napi\n```"
+    assert executor._parse_write_targets(response, modules) == ["/b/gateway/api", "/a/service/api"]